@@ -1,18 +1,63 @@
 import os
 import re
+import asyncio
 import threading
 import sys
+import functools
+import orjson
+import time
+import queue
+import logging
+import atexit
+import sqlite3
+from logging.handlers import QueueHandler, QueueListener
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from flask import Flask, request
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Annotated
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
+from langgraph.cache.base import BaseCache
+from langgraph.types import CachePolicy
 from langchain.chat_models import init_chat_model
-from langchain_core.messages import HumanMessage, AnyMessage, SystemMessage
+from langchain.globals import set_llm_cache
+from langchain_core.caches import InMemoryCache
+from cachetools import TTLCache
+from langchain_core.messages import HumanMessage, AnyMessage, SystemMessage, trim_messages
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor as SchedulerPool
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+
+# -------------------------
+# Logging
+# -------------------------
+# Records go onto a queue and a background QueueListener thread writes them out,
+# so webhook handling never blocks on stdout
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(_log_queue, logging.StreamHandler(sys.stdout))
+_log_listener.start()
+# Write out records still queued when the process exits. Registered before the local
+# modules below are imported: atexit runs hooks in reverse, so their exit hooks (the
+# auth log flush) still log through a running listener
+atexit.register(_log_listener.stop)
+
+log = logging.getLogger("nexifit")
+log.addHandler(QueueHandler(_log_queue))
+log.setLevel(LOG_LEVEL)
+log.propagate = False
+
+from session_store import Session, create_session_store
 
 # Import database functions
 from database import (
@@ -21,7 +66,7 @@ from database import (
     get_user_info, clean_expired_users,
     # Mental health tips functions
     add_mental_health_tip, get_all_mental_health_tips, deactivate_tip, activate_tip,
-    get_next_tip_for_user, log_tip_sent, set_user_tip_preference, 
+    get_next_tip_for_user, get_next_tips_bulk, log_tips_sent_bulk, set_user_tip_preference, 
     get_user_tip_preference, get_users_for_daily_tips, get_user_tip_stats,
     get_global_tip_stats, get_tip_by_id,
     # Workout tracking functions
@@ -42,14 +87,175 @@ ADMIN_CONTACT = os.environ.get("ADMIN_CONTACT", "admin@nexifit.com")
 # Railway environment configuration
 PORT = int(os.environ.get('PORT', 5000))
 DB_PATH = os.environ.get('DB_PATH', '/tmp/nexifit_users.db')
+# Keep-alive connections to api.twilio.com shared by the scheduler/webhook threads
+TWILIO_POOL_SIZE = int(os.environ.get("TWILIO_POOL_SIZE", 32))
+
+@functools.cache
+def get_client():
+    """Sync Twilio client, created on first use (after any worker fork) instead of at import."""
+    http_client = TwilioHttpClient()
+    # Sized for the scheduler pool so concurrent sends reuse connections instead of
+    # re-handshaking; Retry leaves POSTs alone unless the connection itself failed
+    http_client.session.mount("https://", HTTPAdapter(
+        pool_connections=TWILIO_POOL_SIZE,
+        pool_maxsize=TWILIO_POOL_SIZE,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    ))
+    return Client(TWILIO_SID, TWILIO_AUTH_TOKEN, http_client=http_client)
+
+def send_whatsapp_message(to, body):
+    """Blocking WhatsApp send for scheduler jobs and admin commands."""
+    return get_client().messages.create(
+        from_=TWILIO_WHATSAPP_NUMBER,
+        to=to,
+        body=body
+    )
 
-client = Client(TWILIO_SID, TWILIO_AUTH_TOKEN)
+# -------------------------
+# Async worker loop (LLM calls + outbound replies)
+# -------------------------
+# A single event loop in a background thread drives every in-flight
+# conversation, instead of one OS thread per webhook request.
+BG_WORKERS = int(os.environ.get("BG_WORKERS", 16))
+# Max users a broadcast (daily tips, weekly reports) works on at the same time
+BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", 32))
+# Users loaded per page by the broadcasts, so memory doesn't grow with the user count
+BROADCAST_PAGE_SIZE = int(os.environ.get("BROADCAST_PAGE_SIZE", 500))
+# Outbound messages per second through the async client (Twilio's default sender limit)
+TWILIO_MPS = float(os.environ.get("TWILIO_MPS", 25))
+
+async_loop = asyncio.new_event_loop()
+# Blocking work (SQLite, session store) goes through asyncio.to_thread, which runs on
+# the loop's default executor; give it a fixed-size, named pool instead of the implicit one
+async_loop.set_default_executor(
+    ThreadPoolExecutor(max_workers=BG_WORKERS, thread_name_prefix="nexifit-worker")
+)
+threading.Thread(target=async_loop.run_forever, name="nexifit-async", daemon=True).start()
+
+@functools.cache
+def get_async_client():
+    """Twilio client backed by aiohttp. Created lazily so it binds to the async loop."""
+    return Client(TWILIO_SID, TWILIO_AUTH_TOKEN, http_client=AsyncTwilioHttpClient())
+
+class SendRateLimiter:
+    """Token bucket for the async loop: `rate` sends per second, bursting up to `rate`."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        # Only touched from the loop thread, so no lock is needed
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+_send_limiter = SendRateLimiter(TWILIO_MPS)
+
+async def send_message_async(to, body):
+    """Send a WhatsApp message from the async loop without blocking it."""
+    # Broadcasts fan out BROADCAST_CONCURRENCY sends at once; pace them under Twilio's limit
+    await _send_limiter.acquire()
+    return await get_async_client().messages.create_async(
+        from_=TWILIO_WHATSAPP_NUMBER,
+        to=to,
+        body=body
+    )
+
+def run_async(coro):
+    """Schedule a coroutine on the async worker loop from any thread."""
+    return asyncio.run_coroutine_threadsafe(coro, async_loop)
+
+def _log_send_failure(to, future):
+    if future.exception():
+        log.error(f"❌ Failed to send message to {to}: {future.exception()}")
+
+def _log_task_failure(name, future):
+    if future.exception():
+        log.error(f"❌ {name} failed: {future.exception()}")
+
+def send_in_background(to, body):
+    """Queue a WhatsApp message on the async loop so the caller (e.g. the webhook) doesn't wait on Twilio."""
+    future = run_async(send_message_async(to, body))
+    future.add_done_callback(functools.partial(_log_send_failure, to))
+    return future
+
+async def run_bounded(func, items, limit=BROADCAST_CONCURRENCY):
+    """Await func(item) for every item with at most `limit` in flight. Results keep input order."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_one(item):
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*(run_one(item) for item in items))
+
+async def iter_user_pages(fetch_page, page_size=BROADCAST_PAGE_SIZE):
+    """Yield users from fetch_page(after_phone, limit) one page at a time, keyed on phone number."""
+    after_phone = ''
+    while True:
+        page = await asyncio.to_thread(fetch_page, after_phone, page_size)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after_phone = page[-1]['phone_number']
 
 # -------------------------
 # Initialize Gemini
 # -------------------------
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-llm = init_chat_model("gemini-2.0-flash", model_provider="google_genai")
+# Most cached Gemini replies kept, in memory or (pruned hourly) in the SQLite file
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", 1000))
+# When set, cached Gemini replies are kept in this SQLite file and survive restarts
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH")
+# Seconds a cached chatbot-node answer stays valid, and how many trailing turns key it
+NODE_CACHE_TTL = int(os.environ.get("NODE_CACHE_TTL", 3600))
+NODE_CACHE_TAIL = 4
+# Most chatbot-node answers kept before the least recently used is evicted
+NODE_CACHE_SIZE = int(os.environ.get("NODE_CACHE_SIZE", 1000))
+# Max Gemini calls in flight across all users; the rest wait their turn on the async loop
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", 8))
+# Only the most recent turns are kept in a session so prompt size stays bounded
+MAX_HISTORY_MESSAGES = int(os.environ.get("MAX_HISTORY_MESSAGES", 10))
+# History older than this (seconds since the last turn) is dropped; the profile context still carries over
+HISTORY_TTL_SECONDS = int(os.environ.get("HISTORY_TTL_SECONDS", 2 * 3600))
+# Sampling temperature for Gemini; unset keeps the model default. 0 makes replies repeatable
+LLM_TEMPERATURE = os.environ.get("LLM_TEMPERATURE")
+
+@functools.cache
+def get_llm():
+    """Gemini chat model, created on first use so importing the app doesn't set up gRPC/credentials."""
+    kwargs = {"temperature": float(LLM_TEMPERATURE)} if LLM_TEMPERATURE else {}
+    return init_chat_model("gemini-2.0-flash", model_provider="google_genai", **kwargs)
+
+# Global LLM cache: identical (model, messages) inputs return the cached reply
+# instead of another round-trip to Gemini
+if LLM_CACHE_PATH:
+    from langchain_community.cache import SQLiteCache  # Only needed for the persistent cache
+
+    set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
+    log.info(f"✅ Using SQLite LLM cache at {LLM_CACHE_PATH}")
+else:
+    set_llm_cache(InMemoryCache(maxsize=LLM_CACHE_SIZE))
+
+def prune_llm_cache(keep=LLM_CACHE_SIZE):
+    """Keep only the newest `keep` rows of the SQLite LLM cache; SQLiteCache itself never deletes."""
+    conn = sqlite3.connect(LLM_CACHE_PATH)
+    try:
+        with conn:
+            conn.execute(
+                "DELETE FROM full_llm_cache WHERE rowid <= (SELECT MAX(rowid) FROM full_llm_cache) - ?",
+                (keep,)
+            )
+    finally:
+        conn.close()
 
 # -------------------------
 # LangGraph State
@@ -59,28 +265,116 @@ class State(TypedDict):
 
 graph_builder = StateGraph(State)
 
-def chatbot(state: State):
-    response_message = llm.invoke(state["messages"])
+_llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+async def chatbot(state: State):
+    # add_messages gives every message a random id, and the LLM cache keys on the serialized
+    # messages (ids included); without clearing them identical prompts would never share an entry
+    messages = [m.model_copy(update={"id": None}) for m in state["messages"]]
+    async with _llm_semaphore:
+        response_message = await get_llm().ainvoke(messages)
     return {"messages": [response_message]}
 
-graph_builder.add_node("chatbot", chatbot)
+def chatbot_cache_key(state: State):
+    """
+    Key the chatbot node on the system prompts (profile + request type) and the last few
+    turns only, so the same question asked by users with the same profile hits the cache.
+    """
+    messages = state["messages"]
+    system = [m.content for m in messages if m.type == "system"]
+    tail = [(m.type, m.content) for m in messages if m.type != "system"][-NODE_CACHE_TAIL:]
+    return orjson.dumps([system, tail])
+
+class NodeCache(BaseCache):
+    """
+    LangGraph node cache bounded like the LLM cache: LRU eviction past max_size and a single
+    expiry (NODE_CACHE_TTL) for every entry. LangGraph's own InMemoryCache never evicts.
+    """
+
+    def __init__(self, max_size=NODE_CACHE_SIZE, ttl=NODE_CACHE_TTL):
+        super().__init__()
+        self._entries = TTLCache(maxsize=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, keys):
+        with self._lock:
+            found = {key: self._entries.get(key) for key in keys}
+        return {key: self.serde.loads_typed(value) for key, value in found.items() if value is not None}
+
+    async def aget(self, keys):
+        return self.get(keys)
+
+    def set(self, pairs):
+        # Per-entry TTLs are ignored; the chatbot node's policy uses NODE_CACHE_TTL anyway
+        encoded = {key: self.serde.dumps_typed(value) for key, (value, _ttl) in pairs.items()}
+        with self._lock:
+            self._entries.update(encoded)
+
+    async def aset(self, pairs):
+        self.set(pairs)
+
+    def clear(self, namespaces=None):
+        with self._lock:
+            if namespaces is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in namespaces]:
+                del self._entries[key]
+
+    async def aclear(self, namespaces=None):
+        self.clear(namespaces)
+
+graph_builder.add_node(
+    "chatbot",
+    chatbot,
+    cache_policy=CachePolicy(key_func=chatbot_cache_key, ttl=NODE_CACHE_TTL)
+)
 graph_builder.add_edge(START, "chatbot")
 graph_builder.add_edge("chatbot", END)
-graph = graph_builder.compile()
+graph = graph_builder.compile(cache=NodeCache())
+
+def append_message(session, message):
+    """Add a turn to the session history, starting fresh if the conversation has gone stale."""
+    now = time.time()
+    if session.messages and now - session.last_message_at > HISTORY_TTL_SECONDS:
+        session.messages.clear()
+    session.messages.append(message)
+    session.last_message_at = now
 
 # -------------------------
 # Flask App
 # -------------------------
 app = Flask(__name__)
-user_sessions = {}
+# Sessions live in Redis when REDIS_URL is set so every worker sees the same state
+user_sessions = create_session_store()
 
 # Scheduler for reminders and daily tips
-scheduler = BackgroundScheduler()
-scheduler.start()
+SCHEDULER_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", 20))
+# How long a worker's claim on a broadcast run (daily tips, weekly reports) is held;
+# longer than the gap between workers firing the same cron slot, shorter than a day
+BROADCAST_CLAIM_SECONDS = int(os.environ.get("BROADCAST_CLAIM_SECONDS", 12 * 3600))
+
+# Per-user jobs (reminders, goal check-ins) go to the "persistent" SQLite store so they
+# survive restarts without being held in memory; the fixed broadcast jobs are re-added
+# at import and stay in the default memory store
+JOBS_DB_URL = os.environ.get("JOBS_DB_URL", f"sqlite:///{os.path.splitext(DB_PATH)[0]}_jobs.db")
+
+# coalesce + max_instances=1: a late or slow broadcast runs once instead of piling up;
+# misfire_grace_time lets a job that missed its slot (busy pool, restart) still run within 5 min
+scheduler = BackgroundScheduler(
+    jobstores={'default': MemoryJobStore(), 'persistent': SQLAlchemyJobStore(url=JOBS_DB_URL)},
+    executors={'default': SchedulerPool(SCHEDULER_WORKERS)},
+    job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 300}
+)
+# Started at the bottom of the module, once the persisted job functions are defined
 
 # Clean expired users daily
 scheduler.add_job(clean_expired_users, 'interval', days=1)
 
+if LLM_CACHE_PATH:
+    # First run right at start, then hourly, so the cache file stays near LLM_CACHE_SIZE rows
+    scheduler.add_job(prune_llm_cache, 'interval', hours=1, next_run_time=datetime.now())
+
 # Schedule daily mental health tips (7:00 AM every day)
 scheduler.add_job(
     lambda: send_daily_mental_health_tips(),
@@ -91,8 +385,7 @@ scheduler.add_job(
     name='Send Daily Mental Health Tips'
 )
 
-print("✅ Scheduler started")
-print("✅ Daily mental health tips scheduled for 7:00 AM")
+log.info("✅ Daily mental health tips scheduled for 7:00 AM")
 
 # Schedule weekly progress reports (Every Sunday at 8:00 PM)
 scheduler.add_job(
@@ -105,7 +398,7 @@ scheduler.add_job(
     name='Weekly Progress Reports'
 )
 
-print("✅ Weekly progress reports scheduled (Sundays at 8 PM)")
+log.info("✅ Weekly progress reports scheduled (Sundays at 8 PM)")
 
 # -------------------------
 # System Prompt (Updated for conversational responses)
@@ -154,574 +447,638 @@ fitness_system_prompt = SystemMessage(
     )
 )
 
+# Request-type instructions are static, so they are built once here and only
+# the user's profile is rendered per reply
+initial_plan_prompt = SystemMessage(
+    content=(
+        "Request type: INITIAL PLAN - Provide a complete plan for TODAY.\n\n"
+        "Instructions:\n"
+        "- Create a complete workout, nutrition, and diet plan for TODAY\n"
+        "- Clearly label it as 'Today's Workout Plan' at the top\n"
+        "- Include estimated total workout time in minutes\n"
+        "- Nutrition Plan should have macro targets (protein, calories, carbs, fats, water)\n"
+        "- Diet Plan should have actual meal suggestions (breakfast, lunch, dinner, snacks)\n"
+        "- Adjust based on user's time restrictions and injuries"
+    )
+)
+
+follow_up_prompt = SystemMessage(
+    content=(
+        "Request type: FOLLOW-UP QUESTION - Answer conversationally.\n\n"
+        "Instructions:\n"
+        "- Answer the user's question directly and conversationally\n"
+        "- Reference their goals and restrictions when relevant\n"
+        "- Keep response concise and helpful"
+    )
+)
+
+# Base prompt + request type joined once, so every call starts with a single invariant
+# system message (one per request type) followed by the per-user profile
+initial_plan_system_prompt = SystemMessage(
+    content=f"{fitness_system_prompt.content}\n\n{initial_plan_prompt.content}"
+)
+follow_up_system_prompt = SystemMessage(
+    content=f"{fitness_system_prompt.content}\n\n{follow_up_prompt.content}"
+)
+
 # -------------------------
 # MENTAL HEALTH TIPS FUNCTIONS
 # -------------------------
 
-def send_daily_mental_health_tips():
-    """
-    Send mental health tips to all eligible users every morning at 7 AM.
-    Called by APScheduler automatically.
-    """
-    print(f"\n{'='*50}")
-    print(f"🌅 Starting daily mental health tips broadcast - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"{'='*50}")
-    
-    # Get all users who should receive tips
-    users = get_users_for_daily_tips()
-    
-    if not users:
-        print("⚠️ No users found to send tips to")
-        return
-    
-    success_count = 0
-    error_count = 0
-    
-    for user in users:
-        try:
-            phone_number = user['phone_number']
-            name = user['name'] or "there"
-            
-            # Get next tip for this user
-            tip = get_next_tip_for_user(phone_number)
-            
-            if not tip:
-                print(f"⚠️ No tips available for {phone_number}")
-                error_count += 1
-                continue
-            
-            # Format the message
-            category_emoji = {
-                'motivation': '💪',
-                'stress': '🧘',
-                'mindfulness': '🧠',
-                'sleep': '😴',
-                'positivity': '✨',
-                'general': '💭'
-            }
-            
-            emoji = category_emoji.get(tip['category'], '💭')
-            
-            message = (
-                f"🌅 Good morning, {name}!\n\n"
-                f"{emoji} *Today's Mental Wellness Tip:*\n\n"
-                f"{tip['tip_text']}\n\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"Remember: A healthy mind supports a healthy body! 💪🧠\n\n"
-                f"_Reply 'STOP TIPS' to unsubscribe from daily tips._"
-            )
-            
-            # Send via Twilio
-            client.messages.create(
-                from_=TWILIO_WHATSAPP_NUMBER,
-                to=phone_number,
-                body=message
-            )
-            
-            # Log the tip
-            log_tip_sent(phone_number, tip['id'])
-            
-            print(f"✅ Sent tip to {phone_number} (Category: {tip['category']})")
-            success_count += 1
-            
-        except Exception as e:
-            print(f"❌ Error sending tip to {phone_number}: {e}")
-            error_count += 1
-    
-    print(f"\n{'='*50}")
-    print(f"📊 Daily Tips Summary:")
-    print(f"   ✅ Successful: {success_count}")
-    print(f"   ❌ Failed: {error_count}")
-    print(f"   📱 Total Users: {len(users)}")
-    print(f"{'='*50}\n")
+# Emoji shown next to each tip category in outgoing tip messages
+CATEGORY_EMOJI = {
+    'motivation': '💪',
+    'stress': '🧘',
+    'mindfulness': '🧠',
+    'sleep': '😴',
+    'positivity': '✨',
+    'general': '💭'
+}
+
+# Broadcast message bodies, parsed once and filled per user with str.format_map
+DAILY_TIP_TEMPLATE = (
+    "🌅 Good morning, {name}!\n\n"
+    "{emoji} *Today's Mental Wellness Tip:*\n\n"
+    "{tip_text}\n\n"
+    "━━━━━━━━━━━━━━━━\n"
+    "Remember: A healthy mind supports a healthy body! 💪🧠\n\n"
+    "_Reply 'STOP TIPS' to unsubscribe from daily tips._"
+)
 
-def send_weekly_progress_reports():
-    """Send weekly progress reports to all users every Sunday."""
-    print(f"\n{'='*50}")
-    print(f"📊 Sending Weekly Progress Reports - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    print(f"{'='*50}")
+TEST_TIP_TEMPLATE = (
+    "🧪 *TEST TIP*\n\n"
+    "{emoji} *Mental Wellness Tip:*\n\n"
+    "{tip_text}\n\n"
+    "━━━━━━━━━━━━━━━━\n"
+    "Category: {category}\n"
+    "Tip ID: #{id}"
+)
+
+NO_WORKOUT_REPORT_TEMPLATE = (
+    "📊 *Weekly Progress Report*\n\n"
+    "Hey {name}! 👋\n\n"
+    "We noticed you haven't logged any workouts this week.\n\n"
+    "💪 Even a 15-minute workout counts!\n"
+    "Let's get back on track. Ready? 🚀"
+)
+
+WEEKLY_REPORT_TEMPLATE = (
+    "📊 *Your Weekly Progress Report*\n\n"
+    "{emoji} *{praise}, {name}!*\n\n"
+    "━━━━━━━━━━━━━━━━\n"
+    "📅 *This Week's Stats:*\n\n"
+    "✅ Workouts: *{workouts}*\n"
+    "⏱️ Time: *{time_str}*\n"
+    "🔥 Calories: *~{calories} kcal*\n"
+    "📈 Progress: *{progress_pct}%* closer\n\n"
+    "🎯 *Goal:* {goal}\n\n"
+)
+# (minimum workouts this week, emoji, praise), best tier first
+WEEKLY_PRAISE_TIERS = (
+    (5, "🔥", "Outstanding"),
+    (3, "💪", "Great job"),
+    (0, "👍", "Good start"),
+)
+# Closes the weekly report once, after the optional streak line
+WEEKLY_REPORT_TRAILER = "━━━━━━━━━━━━━━━━\nKeep the momentum! 🚀"
+
+async def send_tip_to_user(user, tip):
+    """Send one user their pre-selected tip. Returns True if it was sent."""
+    phone_number = user['phone_number']
+    name = user['name'] or "there"
+
+    try:
+        if not tip:
+            log.warning(f"⚠️ No tips available for {phone_number}")
+            return False
+
+        # Format the message
+        emoji = CATEGORY_EMOJI.get(tip['category'], '💭')
+
+        message = DAILY_TIP_TEMPLATE.format_map(
+            {'name': name, 'emoji': emoji, 'tip_text': tip['tip_text']}
+        )
+
+        # Send via Twilio
+        await send_message_async(phone_number, message)
+
+        log.info(f"✅ Sent tip to {phone_number} (Category: {tip['category']})")
+        return True
+
+    except Exception as e:
+        log.error(f"❌ Error sending tip to {phone_number}: {e}")
+        return False
+
+async def send_daily_mental_health_tips_async():
+    """Send today's tip to every eligible user, BROADCAST_CONCURRENCY users at a time."""
+    log.info(f"\n{'='*50}")
+    log.info(f"🌅 Starting daily mental health tips broadcast - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log.info(f"{'='*50}")
     
-    users = get_users_for_weekly_report()
     success_count = 0
-    
-    for user in users:
-        try:
-            phone_number = user['phone_number']
-            name = user['name'] or "Champion"
-            
-            # Get user's weekly progress
-            progress = get_weekly_progress(phone_number)
-            
-            if not progress:
-                # User hasn't worked out this week
-                message = (
-                    f"📊 *Weekly Progress Report*\n\n"
-                    f"Hey {name}! 👋\n\n"
-                    f"We noticed you haven't logged any workouts this week.\n\n"
-                    f"💪 Even a 15-minute workout counts!\n"
-                    f"Let's get back on track. Ready? 🚀"
-                )
-            else:
-                # User has workout data
-                workouts = progress['workouts_completed']
-                minutes = int(progress['total_minutes'])
-                calories = int(progress['total_calories'])
-                progress_pct = round(progress['avg_progress'], 1)
-                goal = progress['goal']
-                
-                # Format time
-                hours = minutes // 60
-                remaining_mins = minutes % 60
-                time_str = f"{hours}h {remaining_mins}m" if hours > 0 else f"{remaining_mins} min"
-                
-                # Choose emoji based on performance
-                if workouts >= 5:
-                    emoji = "🔥"
-                    praise = "Outstanding"
-                elif workouts >= 3:
-                    emoji = "💪"
-                    praise = "Great job"
-                else:
-                    emoji = "👍"
-                    praise = "Good start"
-                
-                message = (
-                    f"📊 *Your Weekly Progress Report*\n\n"
-                    f"{emoji} *{praise}, {name}!*\n\n"
-                    f"━━━━━━━━━━━━━━━━\n"
-                    f"📅 *This Week's Stats:*\n\n"
-                    f"✅ Workouts: *{workouts}*\n"
-                    f"⏱️ Time: *{time_str}*\n"
-                    f"🔥 Calories: *~{calories} kcal*\n"
-                    f"📈 Progress: *{progress_pct}%* closer\n\n"
-                    f"🎯 *Goal:* {goal}\n\n"
-                    f"━━━━━━━━━━━━━━━━\n"
-                    f"Keep the momentum! 🚀"
-                )
+    total_users = 0
+    async for users in iter_user_pages(get_users_for_daily_tips):
+        # One query picks the page's tips; one transaction logs everything that was sent
+        tips = await asyncio.to_thread(get_next_tips_bulk, [user['phone_number'] for user in users])
+        results = await run_bounded(
+            lambda user: send_tip_to_user(user, tips.get(user['phone_number'])), users
+        )
+        sent = [
+            (user['phone_number'], tips[user['phone_number']]['id'])
+            for user, ok in zip(users, results) if ok
+        ]
+        if sent:
+            await asyncio.to_thread(log_tips_sent_bulk, sent)
+        success_count += len(sent)
+        total_users += len(users)
+    
+    if not total_users:
+        log.warning("⚠️ No users found to send tips to")
+        return
 
-                # Streak report add on
-                streak_data = get_user_streak(phone_number)
-                if streak_data['current_streak'] > 0:
-                    streak_emoji = "🔥" if streak_data['current_streak'] >= 7 else "💪"
-                    message += f"{streak_emoji} *Current Streak:* {streak_data['current_streak']} days\n\n"
-                
-                message += "━━━━━━━━━━━━━━━━\nKeep the momentum! 🚀"
-            
-            # Send message
-            client.messages.create(
-                from_=TWILIO_WHATSAPP_NUMBER,
-                to=phone_number,
-                body=message
-            )
-            
-            print(f"✅ Sent report to {phone_number}")
-            success_count += 1
-            
-        except Exception as e:
-            print(f"❌ Error sending to {phone_number}: {e}")
+    error_count = total_users - success_count
     
-    print(f"📊 Sent {success_count} reports\n{'='*50}\n")
-
+    log.info(f"\n{'='*50}")
+    log.info(f"📊 Daily Tips Summary:")
+    log.info(f"   ✅ Successful: {success_count}")
+    log.info(f"   ❌ Failed: {error_count}")
+    log.info(f"   📱 Total Users: {total_users}")
+    log.info(f"{'='*50}\n")
 
-def handle_tip_admin_commands(sender, incoming_msg):
+def send_daily_mental_health_tips():
     """
-    Handle admin commands for mental health tips management.
-    Returns response message or None if not a tip command.
+    Send mental health tips to all eligible users every morning at 7 AM.
+    Called by APScheduler automatically; blocks until the broadcast on the async loop finishes.
     """
-    
-    if not is_admin(sender):
-        return None
-    
-    msg = incoming_msg.strip()
-    msg_upper = msg.upper()
-    
-    # ADD TIP: ADMIN ADD_TIP category: text
-    if msg_upper.startswith("ADMIN ADD_TIP"):
-        try:
-            # Parse: ADMIN ADD_TIP motivation: Your tip text here
-            content = msg[14:].strip()  # Remove "ADMIN ADD_TIP "
+    # With Redis sessions every worker runs this job; only the one that claims today's run sends
+    if not user_sessions.claim(f"daily_mental_health_tips:{datetime.now():%Y-%m-%d}", BROADCAST_CLAIM_SECONDS):
+        log.info("Daily tips already sent by another worker")
+        return
+    run_async(send_daily_mental_health_tips_async()).result()
+
+async def send_report_to_user(user):
+    """Build and send the weekly progress report for one user. Returns True on success."""
+    phone_number = user['phone_number']
+    name = user['name'] or "Champion"
+
+    try:
+        # Get user's weekly progress
+        progress = await asyncio.to_thread(get_weekly_progress, phone_number)
+        
+        if not progress:
+            # User hasn't worked out this week
+            message = NO_WORKOUT_REPORT_TEMPLATE.format_map({'name': name})
+        else:
+            # User has workout data
+            workouts = progress['workouts_completed']
+            minutes = int(progress['total_minutes'])
+            calories = int(progress['total_calories'])
+            progress_pct = round(progress['avg_progress'], 1)
+            goal = progress['goal']
             
-            if ':' in content:
-                category, tip_text = content.split(':', 1)
-                category = category.strip().lower()
-                tip_text = tip_text.strip()
-            else:
-                category = 'general'
-                tip_text = content
+            # Format time
+            hours = minutes // 60
+            remaining_mins = minutes % 60
+            time_str = f"{hours}h {remaining_mins}m" if hours > 0 else f"{remaining_mins} min"
             
-            if len(tip_text) < 10:
-                return "⚠️ Tip text too short. Minimum 10 characters."
+            # Choose emoji based on performance
+            emoji, praise = next(
+                (emoji, praise) for min_workouts, emoji, praise in WEEKLY_PRAISE_TIERS
+                if workouts >= min_workouts
+            )
             
-            success, message, tip_id = add_mental_health_tip(tip_text, category)
+            message_parts = [WEEKLY_REPORT_TEMPLATE.format_map({
+                'emoji': emoji, 'praise': praise, 'name': name, 'workouts': workouts,
+                'time_str': time_str, 'calories': calories, 'progress_pct': progress_pct, 'goal': goal
+            })]
+
+            # Streak report add on
+            streak_data = await asyncio.to_thread(get_user_streak, phone_number)
+            if streak_data['current_streak'] > 0:
+                streak_emoji = "🔥" if streak_data['current_streak'] >= 7 else "💪"
+                message_parts.append(
+                    f"{streak_emoji} *Current Streak:* {streak_data['current_streak']} days\n\n"
+                )
             
-            if success:
-                return f"✅ Tip added successfully!\nID: {tip_id}\nCategory: {category}\nPreview: {tip_text[:100]}..."
-            else:
-                return f"⚠️ {message}"
-                
-        except Exception as e:
-            return f"⚠️ Error: {str(e)}\n\nUsage:\nADMIN ADD_TIP category: tip text\nExample:\nADMIN ADD_TIP motivation: You are stronger than you think!"
-    
-    # LIST TIPS: ADMIN LIST_TIPS [category]
-    elif msg_upper.startswith("ADMIN LIST_TIPS"):
-        parts = incoming_msg.split()
-        category_filter = parts[2].lower() if len(parts) > 2 else None
-        
-        tips = get_all_mental_health_tips(active_only=True)
+            message_parts.append(WEEKLY_REPORT_TRAILER)
+            message = "".join(message_parts)
         
-        if category_filter:
-            tips = [tip for tip in tips if tip['category'] == category_filter]
+        # Send message
+        await send_message_async(phone_number, message)
         
-        if not tips:
-            return f"📋 No tips found{' for category: ' + category_filter if category_filter else ''}"
+        log.info(f"✅ Sent report to {phone_number}")
+        return True
         
-        # Group by category
-        categories = {}
-        for tip in tips:
-            cat = tip['category']
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(tip)
-        
-        response = f"📋 *Mental Health Tips* ({len(tips)} total)\n\n"
-        
-        for cat, cat_tips in sorted(categories.items()):
-            response += f"━━ {cat.upper()} ({len(cat_tips)}) ━━\n"
-            for tip in cat_tips[:3]:  # Show first 3 per category
-                preview = tip['tip_text'][:80] + "..." if len(tip['tip_text']) > 80 else tip['tip_text']
-                response += f"  #{tip['id']}: {preview}\n"
-            if len(cat_tips) > 3:
-                response += f"  ... and {len(cat_tips) - 3} more\n"
-            response += "\n"
-        
-        response += "\n💡 Use: ADMIN VIEW_TIP <id> to see full tip"
-        return response
-    
-    # VIEW SPECIFIC TIP: ADMIN VIEW_TIP <id>
-    elif msg_upper.startswith("ADMIN VIEW_TIP"):
-        parts = msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN VIEW_TIP <tip_id>"
-        
-        try:
-            tip_id = int(parts[2])
-            tip = get_tip_by_id(tip_id)
-            
-            if not tip:
-                return f"⚠️ Tip #{tip_id} not found"
-            
-            status = "✅ Active" if tip['active'] else "❌ Inactive"
-            
-            return (
-                f"📋 *Tip #{tip['id']}*\n\n"
-                f"Category: {tip['category']}\n"
-                f"Status: {status}\n"
-                f"Added: {tip['date_added'][:10]}\n\n"
-                f"Text:\n{tip['tip_text']}"
-            )
-        except ValueError:
-            return "⚠️ Invalid tip ID. Must be a number."
-    
-    # DEACTIVATE TIP: ADMIN REMOVE_TIP <id>
-    elif msg_upper.startswith("ADMIN REMOVE_TIP"):
-        parts = msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN REMOVE_TIP <tip_id>"
-        
-        try:
-            tip_id = int(parts[2])
-            success, message = deactivate_tip(tip_id)
-            return f"{'✅' if success else '⚠️'} {message}"
-        except ValueError:
-            return "⚠️ Invalid tip ID. Must be a number."
+    except Exception as e:
+        log.error(f"❌ Error sending to {phone_number}: {e}")
+        return False
+
+async def send_weekly_progress_reports_async():
+    """Send every user's weekly report, BROADCAST_CONCURRENCY users at a time."""
+    log.info(f"\n{'='*50}")
+    log.info(f"📊 Sending Weekly Progress Reports - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    log.info(f"{'='*50}")
     
-    # ACTIVATE TIP: ADMIN ACTIVATE_TIP <id>
-    elif msg_upper.startswith("ADMIN ACTIVATE_TIP"):
-        parts = msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN ACTIVATE_TIP <tip_id>"
-        
-        try:
-            tip_id = int(parts[2])
-            success, message = activate_tip(tip_id)
-            return f"{'✅' if success else '⚠️'} {message}"
-        except ValueError:
-            return "⚠️ Invalid tip ID. Must be a number."
+    success_count = 0
+    async for users in iter_user_pages(get_users_for_weekly_report):
+        success_count += sum(await run_bounded(send_report_to_user, users))
     
-    # TIP STATISTICS: ADMIN TIP_STATS [phone_number]
-    elif msg_upper.startswith("ADMIN TIP_STATS"):
-        parts = msg.split()
-        
-        if len(parts) > 2:
-            # Stats for specific user
-            phone_number = parts[2]
-            stats = get_user_tip_stats(phone_number)
-            
-            return (
-                f"📊 *Tip Stats for {phone_number}*\n\n"
-                f"Total Tips Received: {stats['total_tips_received']}\n"
-                f"Last 30 Days: {stats['tips_last_30_days']}\n"
-                f"Last Tip Date: {stats['last_tip_date'] or 'Never'}"
-            )
+    log.info(f"📊 Sent {success_count} reports\n{'='*50}\n")
+
+def send_weekly_progress_reports():
+    """Send weekly progress reports to all users every Sunday."""
+    if not user_sessions.claim(f"weekly_progress_reports:{datetime.now():%Y-%m-%d}", BROADCAST_CLAIM_SECONDS):
+        log.info("Weekly reports already sent by another worker")
+        return
+    run_async(send_weekly_progress_reports_async()).result()
+
+
+# -------------------------
+# TIP ADMIN COMMAND HANDLERS
+# -------------------------
+
+def _admin_add_tip(msg, parts):
+    """ADMIN ADD_TIP category: text"""
+    try:
+        # Parse: ADMIN ADD_TIP motivation: Your tip text here
+        content = msg.split(None, 2)[2].strip() if len(parts) > 2 else ""
+
+        if ':' in content:
+            category, tip_text = content.split(':', 1)
+            category = category.strip().lower()
+            tip_text = tip_text.strip()
         else:
-            # Global stats
-            stats = get_global_tip_stats()
-            
-            response = "📊 *Global Tip Statistics*\n\n"
-            response += f"Active Tips: {stats['total_active_tips']}\n"
-            response += f"Tips Sent Today: {stats['tips_sent_today']}\n"
-            response += f"Users Enabled: {stats['users_with_tips_enabled']}\n\n"
-            response += "Tips by Category:\n"
-            
-            for cat, count in stats['tips_by_category'].items():
-                response += f"  • {cat}: {count}\n"
-            
-            return response
-    
-    # TEST TIP: ADMIN TEST_TIP <phone_number>
-    elif msg_upper.startswith("ADMIN TEST_TIP"):
-        parts = msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN TEST_TIP <phone_number>"
-        
+            category = 'general'
+            tip_text = content
+
+        if len(tip_text) < 10:
+            return "⚠️ Tip text too short. Minimum 10 characters."
+
+        success, message, tip_id = add_mental_health_tip(tip_text, category)
+
+        if success:
+            return f"✅ Tip added successfully!\nID: {tip_id}\nCategory: {category}\nPreview: {tip_text[:100]}..."
+        else:
+            return f"⚠️ {message}"
+
+    except Exception as e:
+        return f"⚠️ Error: {str(e)}\n\nUsage:\nADMIN ADD_TIP category: tip text\nExample:\nADMIN ADD_TIP motivation: You are stronger than you think!"
+
+def _admin_list_tips(msg, parts):
+    """ADMIN LIST_TIPS [category]"""
+    category_filter = parts[2].lower() if len(parts) > 2 else None
+
+    tips = get_all_mental_health_tips(active_only=True)
+
+    if category_filter:
+        tips = [tip for tip in tips if tip['category'] == category_filter]
+
+    if not tips:
+        return f"📋 No tips found{' for category: ' + category_filter if category_filter else ''}"
+
+    # Group by category
+    categories = defaultdict(list)
+    for tip in tips:
+        categories[tip['category']].append(tip)
+
+    lines = [f"📋 *Mental Health Tips* ({len(tips)} total)\n\n"]
+
+    for cat, cat_tips in sorted(categories.items()):
+        lines.append(f"━━ {cat.upper()} ({len(cat_tips)}) ━━\n")
+        for tip in cat_tips[:3]:  # Show first 3 per category
+            preview = tip['tip_text'][:80] + "..." if len(tip['tip_text']) > 80 else tip['tip_text']
+            lines.append(f"  #{tip['id']}: {preview}\n")
+        if len(cat_tips) > 3:
+            lines.append(f"  ... and {len(cat_tips) - 3} more\n")
+        lines.append("\n")
+
+    lines.append("\n💡 Use: ADMIN VIEW_TIP <id> to see full tip")
+    return "".join(lines)
+
+def _admin_view_tip(msg, parts):
+    """ADMIN VIEW_TIP <id>"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN VIEW_TIP <tip_id>"
+
+    try:
+        tip_id = int(parts[2])
+        tip = get_tip_by_id(tip_id)
+
+        if not tip:
+            return f"⚠️ Tip #{tip_id} not found"
+
+        status = "✅ Active" if tip['active'] else "❌ Inactive"
+
+        return (
+            f"📋 *Tip #{tip['id']}*\n\n"
+            f"Category: {tip['category']}\n"
+            f"Status: {status}\n"
+            f"Added: {tip['date_added'][:10]}\n\n"
+            f"Text:\n{tip['tip_text']}"
+        )
+    except ValueError:
+        return "⚠️ Invalid tip ID. Must be a number."
+
+def _admin_remove_tip(msg, parts):
+    """ADMIN REMOVE_TIP <id>"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN REMOVE_TIP <tip_id>"
+
+    try:
+        tip_id = int(parts[2])
+        success, message = deactivate_tip(tip_id)
+        return f"{'✅' if success else '⚠️'} {message}"
+    except ValueError:
+        return "⚠️ Invalid tip ID. Must be a number."
+
+def _admin_activate_tip(msg, parts):
+    """ADMIN ACTIVATE_TIP <id>"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN ACTIVATE_TIP <tip_id>"
+
+    try:
+        tip_id = int(parts[2])
+        success, message = activate_tip(tip_id)
+        return f"{'✅' if success else '⚠️'} {message}"
+    except ValueError:
+        return "⚠️ Invalid tip ID. Must be a number."
+
+def _admin_tip_stats(msg, parts):
+    """ADMIN TIP_STATS [phone_number]"""
+    if len(parts) > 2:
+        # Stats for specific user
         phone_number = parts[2]
-        
-        try:
-            # Get next tip
-            tip = get_next_tip_for_user(phone_number)
-            
-            if not tip:
-                return "⚠️ No tips available"
-            
-            # Send test message
-            category_emoji = {
-                'motivation': '💪',
-                'stress': '🧘',
-                'mindfulness': '🧠',
-                'sleep': '😴',
-                'positivity': '✨',
-                'general': '💭'
-            }
-            
-            emoji = category_emoji.get(tip['category'], '💭')
-            
-            message = (
-                f"🧪 *TEST TIP*\n\n"
-                f"{emoji} *Mental Wellness Tip:*\n\n"
-                f"{tip['tip_text']}\n\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"Category: {tip['category']}\n"
-                f"Tip ID: #{tip['id']}"
-            )
-            
-            client.messages.create(
-                from_=TWILIO_WHATSAPP_NUMBER,
-                to=phone_number,
-                body=message
-            )
-            
-            return f"✅ Test tip sent to {phone_number}\nCategory: {tip['category']}\nTip ID: #{tip['id']}"
-            
-        except Exception as e:
-            return f"⚠️ Error sending test tip: {str(e)}"
-    
-    # BROADCAST TIP NOW: ADMIN BROADCAST_TIP
-    elif msg_upper.startswith("ADMIN BROADCAST_TIP"):
-        try:
-            send_daily_mental_health_tips()
-            return "✅ Broadcasting tips to all users... Check console for details."
-        except Exception as e:
-            return f"⚠️ Error broadcasting tips: {str(e)}"
-    
-    # TIP HELP
-    elif msg_upper == "ADMIN TIP_HELP":
+        stats = get_user_tip_stats(phone_number)
+
         return (
-            "💭 *Mental Health Tips Commands:*\n\n"
-            "ADMIN ADD_TIP category: text\n"
-            "ADMIN LIST_TIPS [category]\n"
-            "ADMIN VIEW_TIP <id>\n"
-            "ADMIN REMOVE_TIP <id>\n"
-            "ADMIN ACTIVATE_TIP <id>\n"
-            "ADMIN TIP_STATS [phone]\n"
-            "ADMIN TEST_TIP <phone>\n"
-            "ADMIN BROADCAST_TIP\n\n"
-            "Categories: motivation, stress, mindfulness, sleep, positivity, general"
+            f"📊 *Tip Stats for {phone_number}*\n\n"
+            f"Total Tips Received: {stats['total_tips_received']}\n"
+            f"Last 30 Days: {stats['tips_last_30_days']}\n"
+            f"Last Tip Date: {stats['last_tip_date'] or 'Never'}"
         )
-    
-    return None
+    else:
+        # Global stats
+        stats = get_global_tip_stats()
+
+        lines = [
+            "📊 *Global Tip Statistics*\n\n",
+            f"Active Tips: {stats['total_active_tips']}\n",
+            f"Tips Sent Today: {stats['tips_sent_today']}\n",
+            f"Users Enabled: {stats['users_with_tips_enabled']}\n\n",
+            "Tips by Category:\n",
+        ]
+        lines.extend(f"  • {cat}: {count}\n" for cat, count in stats['tips_by_category'].items())
+
+        return "".join(lines)
+
+def _admin_test_tip(msg, parts):
+    """ADMIN TEST_TIP <phone_number>"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN TEST_TIP <phone_number>"
+
+    phone_number = parts[2]
+
+    try:
+        # Get next tip
+        tip = get_next_tip_for_user(phone_number)
+
+        if not tip:
+            return "⚠️ No tips available"
+
+        # Send test message
+        message = TEST_TIP_TEMPLATE.format_map({
+            'emoji': CATEGORY_EMOJI.get(tip['category'], '💭'),
+            'tip_text': tip['tip_text'],
+            'category': tip['category'],
+            'id': tip['id'],
+        })
+
+        send_whatsapp_message(phone_number, message)
+
+        return f"✅ Test tip sent to {phone_number}\nCategory: {tip['category']}\nTip ID: #{tip['id']}"
+
+    except Exception as e:
+        return f"⚠️ Error sending test tip: {str(e)}"
+
+def _admin_broadcast_tip(msg, parts):
+    """ADMIN BROADCAST_TIP"""
+    try:
+        future = run_async(send_daily_mental_health_tips_async())
+        future.add_done_callback(functools.partial(_log_task_failure, "Tip broadcast"))
+        return "✅ Broadcasting tips to all users... Check console for details."
+    except Exception as e:
+        return f"⚠️ Error broadcasting tips: {str(e)}"
+
+def _admin_tip_help(msg, parts):
+    """ADMIN TIP_HELP"""
+    return (
+        "💭 *Mental Health Tips Commands:*\n\n"
+        "ADMIN ADD_TIP category: text\n"
+        "ADMIN LIST_TIPS [category]\n"
+        "ADMIN VIEW_TIP <id>\n"
+        "ADMIN REMOVE_TIP <id>\n"
+        "ADMIN ACTIVATE_TIP <id>\n"
+        "ADMIN TIP_STATS [phone]\n"
+        "ADMIN TEST_TIP <phone>\n"
+        "ADMIN BROADCAST_TIP\n\n"
+        "Categories: motivation, stress, mindfulness, sleep, positivity, general"
+    )
+
+# Tip commands share the "ADMIN <COMMAND> ..." form and are merged into _ADMIN_HANDLERS below
+_TIP_ADMIN_HANDLERS = {
+    "ADD_TIP": _admin_add_tip,
+    "LIST_TIPS": _admin_list_tips,
+    "VIEW_TIP": _admin_view_tip,
+    "REMOVE_TIP": _admin_remove_tip,
+    "ACTIVATE_TIP": _admin_activate_tip,
+    "TIP_STATS": _admin_tip_stats,
+    "TEST_TIP": _admin_test_tip,
+    "BROADCAST_TIP": _admin_broadcast_tip,
+    "TIP_HELP": _admin_tip_help,
+}
 
 
 # -------------------------
 # ADMIN COMMAND HANDLERS
 # -------------------------
 
-def handle_admin_command(sender, incoming_msg):
-    """Handle admin commands for user management."""
+def _admin_add(msg, parts):
+    """ADMIN ADD whatsapp:+1234567890 [Name] [Days]"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN ADD <phone_number> [name] [expiry_days]\nExample: ADMIN ADD whatsapp:+1234567890 John 30"
+
+    phone = parts[2]
+    name = parts[3] if len(parts) > 3 else None
+    days = int(parts[4]) if len(parts) > 4 and parts[4].isdigit() else None
+
+    success, message = add_user(phone, name, days)
+    return f"{'✅' if success else '⚠️'} {message}"
+
+def _admin_remove(msg, parts):
+    """ADMIN REMOVE whatsapp:+1234567890"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN REMOVE <phone_number>"
+
+    success, message = remove_user(parts[2])
+    return f"{'✅' if success else '⚠️'} {message}"
+
+def _admin_reactivate(msg, parts):
+    """ADMIN REACTIVATE whatsapp:+1234567890"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN REACTIVATE <phone_number>"
+
+    success, message = reactivate_user(parts[2])
+    return f"{'✅' if success else '⚠️'} {message}"
+
+def _admin_list(msg, parts):
+    """ADMIN LIST"""
+    users = list_all_users()
+    if not users:
+        return "📋 No users in database"
+
+    lines = ["📋 *Authorized Users:*\n\n"]
+    for user in users[:20]:
+        status = "✅" if user['authorized'] else "❌"
+        expiry = f" (Expires: {user['expiry_date'][:10]})" if user['expiry_date'] else ""
+        lines.append(f"{status} {user['phone_number']}{expiry}\n")
+
+    if len(users) > 20:
+        lines.append(f"\n... and {len(users) - 20} more users")
+
+    return "".join(lines)
+
+def _admin_info(msg, parts):
+    """ADMIN INFO whatsapp:+1234567890"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN INFO <phone_number>"
+
+    user = get_user_info(parts[2])
+    if not user:
+        return "⚠️ User not found"
+
+    status = "Active ✅" if user['authorized'] else "Inactive ❌"
+    expiry = user['expiry_date'] if user['expiry_date'] else "No expiry"
+
+    return (f"📋 *User Info:*\n"
+            f"Phone: {user['phone_number']}\n"
+            f"Name: {user['name'] or 'N/A'}\n"
+            f"Status: {status}\n"
+            f"Added: {user['date_added'][:10]}\n"
+            f"Expiry: {expiry}")
+
+def _admin_test_report(msg, parts):
+    """ADMIN TEST_REPORT whatsapp:+1234567890"""
+    if len(parts) < 3:
+        return "⚠️ Usage: ADMIN TEST_REPORT <phone_number>"
+
+    phone = parts[2]
+    progress = get_weekly_progress(phone)
+
+    if not progress:
+        return f"📊 No workout data for {phone} in last 7 days"
+
+    return (
+        f"📊 *Weekly Stats for {phone}*\n\n"
+        f"Workouts: {progress['workouts_completed']}\n"
+        f"Minutes: {int(progress['total_minutes'])}\n"
+        f"Calories: {int(progress['total_calories'])}\n"
+        f"Progress: {round(progress['avg_progress'], 1)}%\n"
+        f"Goal: {progress['goal']}"
+    )
+
+def _admin_send_reports(msg, parts):
+    """ADMIN SEND_REPORTS"""
+    future = run_async(send_weekly_progress_reports_async())
+    future.add_done_callback(functools.partial(_log_task_failure, "Weekly reports"))
+    return "✅ Sending weekly reports now... Check console!"
+
+def _admin_help(msg, parts):
+    """ADMIN / ADMIN HELP"""
+    return (
+        "🔐 *Admin Commands:*\n\n"
+        "📱 USER MANAGEMENT:\n"
+        "ADMIN ADD <phone> [name] [days]\n"
+        "ADMIN REMOVE <phone>\n"
+        "ADMIN REACTIVATE <phone>\n"
+        "ADMIN LIST\n"
+        "ADMIN INFO <phone>\n\n"
+        "💭 MENTAL HEALTH TIPS:\n"
+        "ADMIN TIP_HELP\n\n"
+        "Example:\n"
+        "ADMIN ADD whatsapp:+1234567890 John 30"
+    )
+
+# Second token of "ADMIN <COMMAND> ..." -> handler(msg, parts)
+_ADMIN_HANDLERS = {
+    **_TIP_ADMIN_HANDLERS,
+    "ADD": _admin_add,
+    "REMOVE": _admin_remove,
+    "REACTIVATE": _admin_reactivate,
+    "LIST": _admin_list,
+    "INFO": _admin_info,
+    "TEST_REPORT": _admin_test_report,
+    "SEND_REPORTS": _admin_send_reports,
+    "HELP": _admin_help,
+}
+
+def handle_admin_command(sender, incoming_msg, sender_is_admin=None):
+    """
+    Handle admin commands for user management and mental health tips.
+    Callers that already checked is_admin pass sender_is_admin to skip the second lookup.
+    """
     
-    if not is_admin(sender):
+    if sender_is_admin is None:
+        sender_is_admin = is_admin(sender)
+    if not sender_is_admin:
         return None
     
-    # CHECK FOR TIP COMMANDS FIRST
-    tip_response = handle_tip_admin_commands(sender, incoming_msg)
-    if tip_response:
-        return tip_response
-    
-    msg = incoming_msg.upper().strip()
-    
-    # ADD USER: ADMIN ADD whatsapp:+1234567890 [Name] [Days]
-    if msg.startswith("ADMIN ADD"):
-        parts = incoming_msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN ADD <phone_number> [name] [expiry_days]\nExample: ADMIN ADD whatsapp:+1234567890 John 30"
-        
-        phone = parts[2]
-        name = parts[3] if len(parts) > 3 else None
-        days = int(parts[4]) if len(parts) > 4 and parts[4].isdigit() else None
-        
-        success, message = add_user(phone, name, days)
-        return f"{'✅' if success else '⚠️'} {message}"
-    
-    # REMOVE USER: ADMIN REMOVE whatsapp:+1234567890
-    elif msg.startswith("ADMIN REMOVE"):
-        parts = incoming_msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN REMOVE <phone_number>"
-        
-        phone = parts[2]
-        success, message = remove_user(phone)
-        return f"{'✅' if success else '⚠️'} {message}"
-    
-    # REACTIVATE USER: ADMIN REACTIVATE whatsapp:+1234567890
-    elif msg.startswith("ADMIN REACTIVATE"):
-        parts = incoming_msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN REACTIVATE <phone_number>"
-        
-        phone = parts[2]
-        success, message = reactivate_user(phone)
-        return f"{'✅' if success else '⚠️'} {message}"
-    
-    # LIST USERS: ADMIN LIST
-    elif msg.startswith("ADMIN LIST"):
-        users = list_all_users()
-        if not users:
-            return "📋 No users in database"
-        
-        response = "📋 *Authorized Users:*\n\n"
-        for user in users[:20]:
-            status = "✅" if user['authorized'] else "❌"
-            expiry = f" (Expires: {user['expiry_date'][:10]})" if user['expiry_date'] else ""
-            response += f"{status} {user['phone_number']}{expiry}\n"
-        
-        if len(users) > 20:
-            response += f"\n... and {len(users) - 20} more users"
-        
-        return response
-    
-    # USER INFO: ADMIN INFO whatsapp:+1234567890
-    elif msg.startswith("ADMIN INFO"):
-        parts = incoming_msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN INFO <phone_number>"
-        
-        phone = parts[2]
-        user = get_user_info(phone)
-        
-        if not user:
-            return "⚠️ User not found"
-        
-        status = "Active ✅" if user['authorized'] else "Inactive ❌"
-        expiry = user['expiry_date'] if user['expiry_date'] else "No expiry"
-        
-        return (f"📋 *User Info:*\n"
-                f"Phone: {user['phone_number']}\n"
-                f"Name: {user['name'] or 'N/A'}\n"
-                f"Status: {status}\n"
-                f"Added: {user['date_added'][:10]}\n"
-                f"Expiry: {expiry}")
-    
-    # TEST WEEKLY REPORT
-    elif msg.startswith("ADMIN TEST_REPORT"):
-        parts = msg.split()
-        if len(parts) < 3:
-            return "⚠️ Usage: ADMIN TEST_REPORT <phone_number>"
-        
-        phone = parts[2]
-        progress = get_weekly_progress(phone)
-        
-        if not progress:
-            return f"📊 No workout data for {phone} in last 7 days"
-        
-        return (
-            f"📊 *Weekly Stats for {phone}*\n\n"
-            f"Workouts: {progress['workouts_completed']}\n"
-            f"Minutes: {int(progress['total_minutes'])}\n"
-            f"Calories: {int(progress['total_calories'])}\n"
-            f"Progress: {round(progress['avg_progress'], 1)}%\n"
-            f"Goal: {progress['goal']}"
-        )
-    
-    # SEND REPORTS NOW
-    elif msg == "ADMIN SEND_REPORTS":
-        send_weekly_progress_reports()
-        return "✅ Sending weekly reports now... Check console!"
+    msg = incoming_msg.strip()
+    parts = msg.split()
+    if not parts or parts[0].upper() != "ADMIN":
+        return None
+    if len(parts) == 1:
+        return _admin_help(msg, parts)
 
-    # ADMIN HELP
-    elif msg.startswith("ADMIN HELP") or msg == "ADMIN":
-        return (
-            "🔐 *Admin Commands:*\n\n"
-            "📱 USER MANAGEMENT:\n"
-            "ADMIN ADD <phone> [name] [days]\n"
-            "ADMIN REMOVE <phone>\n"
-            "ADMIN REACTIVATE <phone>\n"
-            "ADMIN LIST\n"
-            "ADMIN INFO <phone>\n\n"
-            "💭 MENTAL HEALTH TIPS:\n"
-            "ADMIN TIP_HELP\n\n"
-            "Example:\n"
-            "ADMIN ADD whatsapp:+1234567890 John 30"
-        )
-    
-    return None
+    handler = _ADMIN_HANDLERS.get(parts[1].upper())
+    return handler(msg, parts) if handler else None
 
 # -------------------------
 # Reminder Helper Functions
 # -------------------------
 def send_reminder(task, sender):
-    """Send reminder via Twilio."""
-    client.messages.create(
-        from_=TWILIO_WHATSAPP_NUMBER,
-        to=sender,
-        body=f"⏰ Reminder: {task}"
-    )
-    print(f"Sent reminder to {sender}: {task}")
+    """Send reminder via Twilio. Queued on the async loop so the scheduler worker is freed at once."""
+    send_in_background(sender, f"⏰ Reminder: {task}")
+    log.info(f"Queued reminder for {sender}: {task}")
+
+# Compiled once at import instead of on every reminder message
+_RELATIVE_REMINDER_RE = re.compile(r"remind me to (.+) in (\d+)\s*(second|seconds|minute|minutes|hour|hours)")
+_ABSOLUTE_REMINDER_RE = re.compile(r"remind me to (.+) at (\d{1,2}):(\d{2})")
+# Seconds per unit matched by _RELATIVE_REMINDER_RE
+_REMINDER_UNIT_SECONDS = {
+    "second": 1, "seconds": 1,
+    "minute": 60, "minutes": 60,
+    "hour": 3600, "hours": 3600,
+}
 
 def parse_reminder_message(message):
-    """Parse reminder messages with regex."""
-    message = message.lower().strip()
+    """Parse reminder messages with regex. Expects the already lower-cased, stripped message."""
+    now = datetime.now()
 
     # Relative time: "in X minutes/hours"
-    match_relative = re.search(r"remind me to (.+) in (\d+)\s*(second|seconds|minute|minutes|hour|hours)", message)
+    match_relative = _RELATIVE_REMINDER_RE.search(message)
     if match_relative:
         task = match_relative.group(1).strip()
         amount = int(match_relative.group(2))
-        unit = match_relative.group(3)
-
-        if "hour" in unit:
-            remind_time = datetime.now() + timedelta(hours=amount)
-        elif "minute" in unit:
-            remind_time = datetime.now() + timedelta(minutes=amount)
-        else:
-            remind_time = datetime.now() + timedelta(seconds=amount)
+        unit_seconds = _REMINDER_UNIT_SECONDS[match_relative.group(3)]
+        remind_time = now + timedelta(seconds=amount * unit_seconds)
         return task, remind_time
 
     # Absolute time: "at HH:MM"
-    match_absolute = re.search(r"remind me to (.+) at (\d{1,2}):(\d{2})", message)
+    match_absolute = _ABSOLUTE_REMINDER_RE.search(message)
     if match_absolute:
         task = match_absolute.group(1).strip()
         hour = int(match_absolute.group(2))
         minute = int(match_absolute.group(3))
-        now = datetime.now()
         remind_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
         if remind_time < now:
             remind_time += timedelta(days=1)
@@ -731,84 +1088,108 @@ def parse_reminder_message(message):
 
 def schedule_reminder(sender, task, run_time):
     """Schedule a reminder job."""
-    scheduler.add_job(send_reminder, "date", run_date=run_time, args=[task, sender])
-    print(f"Reminder set for {sender} at {run_time}")
+    scheduler.add_job(
+        send_reminder, "date", run_date=run_time, args=[task, sender], jobstore='persistent'
+    )
+    log.info(f"Reminder set for {sender} at {run_time}")
 
 # -------------------------
 # Helper: Check if message is fitness-related
 # -------------------------
-def is_fitness_related(message):
+# Expanded fitness keywords (matched as substrings, so "run" also covers "running")
+FITNESS_KEYWORDS = [
+    "workout", "diet", "gym", "exercise", "yoga", "health", "fitness",
+    "calories", "nutrition", "training", "protein", "cardio", "strength",
+    "weight", "muscle", "fat", "run", "walk", "jog", "swim", "cycle",
+    "stretch", "warm", "cool", "rest", "recovery", "sleep", "meal",
+    "food", "eat", "drink", "water", "supplement", "vitamin", "carb",
+    "plan", "routine", "schedule", "goal", "body", "abs", "leg", "arm",
+    "chest", "back", "shoulder", "core", "squat", "push", "pull", "lift",
+    "rep", "set", "intensity", "duration", "time", "minute", "hour",
+    "injury", "pain", "sore", "tired", "energy", "motivation", "progress"
+]
+
+# Question words - allow fitness-related questions
+QUESTION_WORDS = ["what", "how", "why", "when", "where", "can", "should",
+                  "could", "would", "is", "are", "do", "does", "tell", "show"]
+
+# One scan per message instead of an any() loop per keyword
+_FITNESS_KEYWORD_RE = re.compile("|".join(map(re.escape, FITNESS_KEYWORDS)))
+_QUESTION_WORDS = "|".join(map(re.escape, QUESTION_WORDS))
+_QUESTION_RE = re.compile(rf"^(?:{_QUESTION_WORDS})| (?:{_QUESTION_WORDS}) ")
+
+def is_fitness_related(message, message_lower=None):
     """Check if message is fitness-related with broader keyword matching."""
-    message_lower = message.lower()
-    
-    # Expanded fitness keywords
-    fitness_keywords = [
-        "workout", "diet", "gym", "exercise", "yoga", "health", "fitness",
-        "calories", "nutrition", "training", "protein", "cardio", "strength",
-        "weight", "muscle", "fat", "run", "walk", "jog", "swim", "cycle",
-        "stretch", "warm", "cool", "rest", "recovery", "sleep", "meal",
-        "food", "eat", "drink", "water", "supplement", "vitamin", "carb",
-        "plan", "routine", "schedule", "goal", "body", "abs", "leg", "arm",
-        "chest", "back", "shoulder", "core", "squat", "push", "pull", "lift",
-        "rep", "set", "intensity", "duration", "time", "minute", "hour",
-        "injury", "pain", "sore", "tired", "energy", "motivation", "progress"
-    ]
-    
-    # Question words - allow fitness-related questions
-    question_words = ["what", "how", "why", "when", "where", "can", "should", 
-                      "could", "would", "is", "are", "do", "does", "tell", "show"]
+    if message_lower is None:
+        message_lower = message.lower()
     
     # Check if it's a fitness keyword OR a question (likely fitness-related in context)
-    has_fitness_keyword = any(word in message_lower for word in fitness_keywords)
-    is_question = any(message_lower.startswith(word) or f" {word} " in message_lower 
-                     for word in question_words)
+    if _FITNESS_KEYWORD_RE.search(message_lower):
+        return True
     
     # Also allow short messages (likely follow-ups) after onboarding is done
     is_short_followup = len(message.split()) <= 5
     
-    return has_fitness_keyword or (is_question and is_short_followup)
+    return is_short_followup and _QUESTION_RE.search(message_lower) is not None
+
+# -------------------------
+# Helper: Compiled patterns for reply parsing
+# -------------------------
+_DIGITS_RE = re.compile(r"\d+(?:\.\d+)?")
+_ESTIMATED_TIME_RE = re.compile(r"Estimated Time:\s*~?(\d+)\s*minutes?", re.IGNORECASE)
+# The estimate sits in the workout block at the top of a plan, so look there first
+_ESTIMATED_TIME_SCAN_CHARS = 2048
+
+# MET value by fitness goal. Anchored lookaheads keep the old if/elif priority
+# (muscle > weight/fat > cardio) regardless of where the words appear in the goal;
+# the group that matched (match.lastindex) selects the MET.
+_MET_GOAL_RE = re.compile(r"(?=(.*muscle))|(?=(.*(?:weight|fat)))|(?=(.*cardio))", re.DOTALL | re.IGNORECASE)
+_MET_BY_GROUP = {1: 8, 2: 6, 3: 7}
+
+@functools.lru_cache(maxsize=4096)
+def build_profile_context(name, age, gender, weight, height, fitness_goal, injury, restrictions):
+    """
+    Profile SystemMessage for the LLM prompt. Memoized on the profile values, so it is
+    only rebuilt after onboarding or restrictions change them.
+    """
+    return SystemMessage(
+        content=(
+            f"User's details:\n"
+            f"- Name: {name}\n"
+            f"- Age: {age}\n"
+            f"- Gender: {gender}\n"
+            f"- Weight: {weight}\n"
+            f"- Height: {height}\n"
+            f"- Goal: {fitness_goal}\n"
+            f"- Injuries: {injury}\n"
+            f"- Today's Restrictions: {restrictions}"
+        )
+    )
 
 # -------------------------
 # Background reply processor (UPDATED)
 # -------------------------
-def process_and_reply(sender, is_initial_plan=False, incoming_msg=""):
+async def process_and_reply(sender, is_initial_plan=False, incoming_msg=""):
     try:
-        session = user_sessions[sender]
+        session = await asyncio.to_thread(user_sessions.get, sender)
 
         # Prepare system + context
-        system_context = SystemMessage(
-            content=(
-                f"User's details:\n"
-                f"- Name: {session['name']}\n"
-                f"- Age: {session['age']}\n"
-                f"- Gender: {session['gender']}\n"
-                f"- Weight: {session['weight']}\n"
-                f"- Height: {session['height']}\n"
-                f"- Goal: {session['fitness_goal']}\n"
-                f"- Injuries: {session['injury']}\n"
-                f"- Today's Restrictions: {session.get('user_restrictions', 'None')}\n\n"
-                f"Request type: {'INITIAL PLAN - Provide a complete plan for TODAY' if is_initial_plan else 'FOLLOW-UP QUESTION - Answer conversationally'}.\n\n"
-                "Instructions:\n"
-                + ("- Create a complete workout, nutrition, and diet plan for TODAY\n"
-                   "- Clearly label it as 'Today's Workout Plan' at the top\n"
-                   "- Include estimated total workout time in minutes\n"
-                   "- Nutrition Plan should have macro targets (protein, calories, carbs, fats, water)\n"
-                   "- Diet Plan should have actual meal suggestions (breakfast, lunch, dinner, snacks)\n"
-                   "- Adjust based on user's time restrictions and injuries" if is_initial_plan else 
-                   "- Answer the user's question directly and conversationally\n"
-                   "- Reference their goals and restrictions when relevant\n"
-                   "- Keep response concise and helpful")
-            )
+        system_context = build_profile_context(
+            session.name, session.age, session.gender, session.weight,
+            session.height, session.fitness_goal, session.injury,
+            session.user_restrictions
         )
+        system_prompt = initial_plan_system_prompt if is_initial_plan else follow_up_system_prompt
 
-        state = {"messages": [fitness_system_prompt, system_context] + session["messages"]}
-        result = graph.invoke(state)
-        response_text = result["messages"][-1].content.strip()
+        state = {"messages": [system_prompt, system_context] + session.messages}
+        # Long replies start going out part by part while Gemini is still generating
+        result, streamed_chars, streamed_parts = await stream_reply(sender, state)
+        reply = result["messages"][-1].content
+        response_text = reply.strip()
 
         # === ADD PERSONALIZED BONUS TIPS (Only for initial/today's plan) ===
-        msg_lower = incoming_msg.lower() if incoming_msg else ""
-        if is_initial_plan or "today" in msg_lower or "plan" in msg_lower or "workout" in msg_lower:
-            bonus_tips = get_personalized_bonus_tips(session)
+        if is_initial_plan or (incoming_msg and _BONUS_TIPS_RE.search(incoming_msg.lower())):
+            bonus_tips = get_personalized_bonus_tips(session.profile())
             if bonus_tips:
                 bonus_section = "\n\n*Bonus Tips Curated Just For You*\n"
                 for tip in bonus_tips:
@@ -818,50 +1199,47 @@ def process_and_reply(sender, is_initial_plan=False, incoming_msg=""):
         # Only add reminder prompt and schedule motivational message for initial plans
         if is_initial_plan:
             # Extract Estimated Workout Time
-            match_time = re.search(r"Estimated Time:\s*~?(\d+)\s*minutes?", response_text, re.IGNORECASE)
+            match_time = (
+                _ESTIMATED_TIME_RE.search(response_text, 0, _ESTIMATED_TIME_SCAN_CHARS)
+                or _ESTIMATED_TIME_RE.search(response_text)
+            )
             workout_minutes = int(match_time.group(1)) if match_time else None
             calories_burned = None
             progress_percent = None
 
             # Estimate Calories Burned & Progress
-            if workout_minutes and session.get("weight") and session.get("fitness_goal"):
+            if workout_minutes and session.weight and session.fitness_goal:
                 try:
-                    weight = float(re.findall(r"\d+", str(session["weight"]))[0])
-                    goal = str(session["fitness_goal"]).lower()
-
-                    if "muscle" in goal:
-                        MET = 8
-                    elif "weight" in goal or "fat" in goal:
-                        MET = 6
-                    elif "cardio" in goal:
-                        MET = 7
-                    else:
-                        MET = 5
+                    weight = float(_DIGITS_RE.search(str(session.weight)).group())
+                    # Case-insensitive pattern; no lowered copy of the goal needed
+                    match_met = _MET_GOAL_RE.match(str(session.fitness_goal))
+                    MET = _MET_BY_GROUP[match_met.lastindex] if match_met else 5
 
                     calories_burned = int(workout_minutes * MET * 3.5 * weight / 200)
                     progress_percent = min(round(workout_minutes / 10, 1), 100)
 
                     # 🆕 Save workout to database
-                    log_workout_completion(
+                    await asyncio.to_thread(
+                        log_workout_completion,
                         sender, 
                         workout_minutes, 
                         calories_burned, 
                         progress_percent, 
-                        session["fitness_goal"]
+                        session.fitness_goal
                     )
 
                     # Update streak tracking
-                    current_streak, is_new_record, broke_streak = update_workout_streak(sender)
+                    current_streak, is_new_record, broke_streak = await asyncio.to_thread(update_workout_streak, sender)
                     
                     # Store in session for motivational message
-                    session['latest_streak'] = {
+                    session.latest_streak = {
                         'current': current_streak,
                         'is_record': is_new_record,
                         'broke': broke_streak
                     }
 
                 except Exception as e:
-                    print("Calorie calculation error:", e)
+                    log.error("Calorie calculation error: %s", e)
 
             # Add Reminder Help Prompt
             if "would you like to set any reminders" not in response_text.lower():
@@ -875,14 +1253,14 @@ def process_and_reply(sender, is_initial_plan=False, incoming_msg=""):
             # Schedule Motivational Message After Workout
             if workout_minutes:
                 motivational_msg = (
-                    f"🔥 Great job, {session['name']}!\n\n"
+                    f"🔥 Great job, {session.name}!\n\n"
                     f"Today you lost approximately {calories_burned or 0} calories "
-                    f"and you're about {progress_percent or 0}% closer to your goal: *{session['fitness_goal']}*.\n"
+                    f"and you're about {progress_percent or 0}% closer to your goal: *{session.fitness_goal}*.\n"
                     "Keep it up! 💪"
                 )
 
                 # Streak tracking
-                streak_info = session.get('latest_streak')
+                streak_info = session.latest_streak
                 if streak_info:
                     current = streak_info['current']
                     
@@ -905,89 +1283,185 @@ def process_and_reply(sender, is_initial_plan=False, incoming_msg=""):
                 
                 motivational_msg += "\n\nKeep it up! 💪"
 
-                run_time = datetime.now() + timedelta(minutes=workout_minutes)
-                scheduler.add_job(
-                    client.messages.create,
-                    "date",
-                    run_date=run_time,
-                    kwargs={
-                        "from_": TWILIO_WHATSAPP_NUMBER,
-                        "to": sender,
-                        "body": motivational_msg
-                    }
+                # A timer on the async loop, not a scheduler job per workout
+                asyncio.get_running_loop().call_later(
+                    workout_minutes * 60, send_in_background, sender, motivational_msg
                 )
-                print(f"Motivational message scheduled for {sender} in {workout_minutes} min")
-
-        # Send Main LLM Response
-        # Smart chunking: split at sentence boundaries, not mid-sentence
-        def smart_chunk(text, max_length=1500):
-            if len(text) <= max_length:
-                return [text]
-            
-            chunks = []
-            while text:
-                if len(text) <= max_length:
-                    chunks.append(text)
-                    break
-                
-                # Find the last sentence boundary before max_length
-                chunk = text[:max_length]
-                
-                # Look for sentence endings: . ! ? followed by space or newline
-                last_period = max(chunk.rfind('. '), chunk.rfind('.\n'))
-                last_exclaim = max(chunk.rfind('! '), chunk.rfind('!\n'))
-                last_question = max(chunk.rfind('? '), chunk.rfind('?\n'))
-                
-                split_pos = max(last_period, last_exclaim, last_question)
-                
-                # If no sentence boundary found, look for newlines
-                if split_pos == -1:
-                    split_pos = chunk.rfind('\n')
-                
-                # If still nothing, split at last space
-                if split_pos == -1:
-                    split_pos = chunk.rfind(' ')
-                
-                # If still nothing (no spaces), just split at max_length
-                if split_pos == -1:
-                    split_pos = max_length - 1
-                else:
-                    split_pos += 1  # Include the punctuation/newline
-                
-                chunks.append(text[:split_pos].strip())
-                text = text[split_pos:].strip()
-            
-            return chunks
+                log.info(f"Motivational message scheduled for {sender} in {workout_minutes} min")
+
+        # Send Main LLM Response (whatever stream_reply hasn't sent yet, plus tips/prompts added above)
+        leading_ws = len(reply) - len(reply.lstrip())
+        unsent = response_text[min(max(streamed_chars - leading_ws, 0), len(reply.strip())):].strip()
+        chunks = list(smart_chunk(unsent, 1500)) if unsent or not streamed_parts else []
+        reply_message = result["messages"][-1]
+        latest_streak = session.latest_streak
+
+        def apply_reply(current):
+            # Applied to the freshest copy: messages the webhook saved while Gemini ran are kept
+            append_message(current, reply_message)
+            if latest_streak is not None:
+                current.latest_streak = latest_streak
+            # Keep the last few turns only; always start on a user message so Gemini accepts the history
+            current.messages = trim_messages(
+                current.messages,
+                max_tokens=MAX_HISTORY_MESSAGES,
+                token_counter=len,
+                strategy="last",
+                start_on="human",
+            )
 
-        chunks = smart_chunk(response_text, 1500)
-        session["messages"].append(result["messages"][-1])
+        await asyncio.to_thread(user_sessions.update, sender, apply_reply)
 
         total_parts = len(chunks)
+        bodies = []
         for idx, chunk in enumerate(chunks, start=1):
-            if total_parts > 1:
+            if streamed_parts:
+                # Earlier parts went out without a total; keep counting from there
+                body = f"(Part {streamed_parts + idx})\n\n{chunk}"
+            elif total_parts > 1:
                 body = f"(Part {idx}/{total_parts})\n\n{chunk}"
             else:
                 body = chunk
+            bodies.append(body)
+            log.debug(f"reply part {idx}/{total_parts}: {len(chunk)} chars")
 
-            client.messages.create(
-                from_=TWILIO_WHATSAPP_NUMBER,
-                to=sender,
-                body=body
-            )
-            print(f"DEBUG reply part {idx}/{total_parts}: {len(chunk)} chars")
+        # Send all parts concurrently; the (Part x/y) labels keep them readable
+        # even if WhatsApp delivers them slightly out of order
+        await asyncio.gather(*(send_message_async(sender, body) for body in bodies))
 
     except Exception as e:
-        print("Error in process_and_reply:", e)
+        log.error("Error in process_and_reply: %s", e)
         # Send error message to user
         try:
-            client.messages.create(
-                from_=TWILIO_WHATSAPP_NUMBER,
-                to=sender,
-                body="⚠️ Sorry, I encountered an error. Please try asking your question again."
+            await send_message_async(
+                sender,
+                "⚠️ Sorry, I encountered an error. Please try asking your question again."
             )
         except:
             pass
 
+# -------------------------
+# Helper: Split long replies for WhatsApp
+# -------------------------
+def find_chunk_split(text, start, max_length):
+    """
+    End offset for the part of `text` that starts at `start`: the last sentence end
+    within max_length, else the last newline, else the last space, else a hard cut.
+    """
+    limit = start + max_length
+    # Look for sentence endings: . ! ? followed by space or newline
+    split_pos = max(
+        text.rfind('. ', start, limit), text.rfind('.\n', start, limit),
+        text.rfind('! ', start, limit), text.rfind('!\n', start, limit),
+        text.rfind('? ', start, limit), text.rfind('?\n', start, limit),
+    )
+    # If no sentence boundary found, fall back to a newline, then a space
+    if split_pos == -1:
+        split_pos = text.rfind('\n', start, limit)
+    if split_pos == -1:
+        split_pos = text.rfind(' ', start, limit)
+
+    # If still nothing (no spaces), just split at max_length
+    if split_pos == -1:
+        return limit - 1
+    return split_pos + 1  # Include the punctuation/newline
+
+def smart_chunk(text, max_length=1500):
+    """
+    Yield pieces of at most max_length chars, split at sentence boundaries where possible.
+    Walks offsets into the original string instead of re-slicing the remainder each pass.
+    """
+    if len(text) <= max_length:
+        yield text
+        return
+
+    start, end = 0, len(text)
+    while start < end:
+        if end - start <= max_length:
+            yield text[start:end]
+            break
+
+        split_pos = find_chunk_split(text, start, max_length)
+        yield text[start:split_pos].strip()
+
+        # Drop whitespace around the remainder, as str.strip() would
+        start = split_pos
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+
+async def stream_reply(sender, state, max_length=1500):
+    """
+    Run the graph and send full-size parts to the user while Gemini is still generating.
+    Returns (final graph state, chars of the reply already sent, number of parts sent).
+    """
+    result = None
+    streamed = ""
+    sent_upto = 0
+    parts_sent = 0
+
+    async for mode, data in graph.astream(state, stream_mode=["messages", "values"]):
+        if mode == "values":
+            result = data
+            continue
+
+        chunk, metadata = data
+        if metadata.get("langgraph_node") != "chatbot" or not isinstance(chunk.content, str):
+            continue
+        streamed += chunk.content
+
+        # Cut only once more than a full part is buffered, so the split can land on a sentence end
+        while len(streamed) - sent_upto > max_length:
+            split_pos = find_chunk_split(streamed, sent_upto, max_length)
+            part = streamed[sent_upto:split_pos].strip()
+            sent_upto = split_pos
+            while sent_upto < len(streamed) and streamed[sent_upto].isspace():
+                sent_upto += 1
+
+            parts_sent += 1
+            log.debug(f"streamed reply part {parts_sent}: {len(part)} chars")
+            await send_message_async(sender, f"(Part {parts_sent})\n\n{part}")
+
+    return result, sent_upto, parts_sent
+
+# -------------------------
+# Conversation intent keywords
+# -------------------------
+def _keyword_pattern(keywords):
+    """Compile a keyword list into one alternation so a message is scanned in a single pass."""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+_WEEKLY_PLAN_RE = _keyword_pattern(["weekly plan", "week plan", "7 day", "weekly workout"])
+_TODAY_PLAN_RE = _keyword_pattern(["today", "today's plan", "plan for today", "workout today"])
+_PLAN_REQUEST_RE = _keyword_pattern(["plan", "workout", "today", "weekly", "routine"])
+# Whole-message commands in the conversation branch -> intent, so one dict lookup replaces the list scans
+_EXACT_COMMANDS = {
+    **dict.fromkeys(['streak', 'my streak', 'check streak', 'show streak', 'streak stats'], 'streak'),
+    **dict.fromkeys(['stop tips', 'no tips', 'disable tips', 'unsubscribe tips'], 'tips_off'),
+    **dict.fromkeys(['start tips', 'enable tips', 'resume tips', 'subscribe tips'], 'tips_on'),
+}
+# Follow-ups that get the personalized bonus tips appended
+_BONUS_TIPS_RE = _keyword_pattern(["today", "plan", "workout"])
+
+# -------------------------
+# Access audit logging
+# -------------------------
+# Successful access is logged once per user per day; rejections and admin commands are always logged
+_access_logged = set()
+_access_logged_day = None
+
+def log_authorized_access(sender):
+    """Record a user's first authorized message of the day in auth_logs."""
+    global _access_logged_day
+    today = datetime.now().date()
+    if today != _access_logged_day:
+        _access_logged.clear()
+        _access_logged_day = today
+    if sender not in _access_logged:
+        _access_logged.add(sender)
+        log_auth_attempt(sender, "authorized_access", success=True)
+
 # -------------------------
 # Webhook for WhatsApp
 # -------------------------
@@ -1002,37 +1476,36 @@ def whatsapp_webhook():
     """
     incoming_msg = request.form.get("Body", "").strip()
     sender = request.form.get("From")
-    print(f"\n{'='*60}")
-    print(f"📩 INCOMING MESSAGE")
-    print(f"   From: {sender}")
-    print(f"   Message: {incoming_msg}")
-    print(f"{'='*60}")
+    log.info(f"\n{'='*60}")
+    log.info(f"📩 INCOMING MESSAGE")
+    log.info(f"   From: {sender}")
+    log.info(f"   Message: {incoming_msg}")
+    log.info(f"{'='*60}")
 
     # =====================================================================
     # STEP 1: CHECK IF THIS IS AN ADMIN COMMAND (BEFORE ANY AUTH CHECKS)
     # =====================================================================
     
-    msg_upper = incoming_msg.upper().strip()
-    
-    if msg_upper.startswith("ADMIN"):
-        print(f"🔐 Admin command detected: {msg_upper[:50]}")
+    # incoming_msg is already stripped; only the 5-char prefix needs upper-casing
+    if incoming_msg[:5].upper() == "ADMIN":
+        log.info(f"🔐 Admin command detected: {incoming_msg[:50].upper()}")
         
         # Check if sender is admin
         if is_admin(sender):
-            print(f"✅ {sender} is ADMIN - executing command")
-            admin_response = handle_admin_command(sender, incoming_msg)
+            log.info(f"✅ {sender} is ADMIN - executing command")
+            admin_response = handle_admin_command(sender, incoming_msg, sender_is_admin=True)
             
             if admin_response:
                 resp = MessagingResponse()
                 resp.message(admin_response)
                 log_auth_attempt(sender, "admin_command_success", success=True)
-                print(f"✅ Admin command executed successfully\n")
+                log.info(f"✅ Admin command executed successfully\n")
                 return str(resp)
             else:
-                print(f"⚠️ Admin command returned no response\n")
+                log.warning(f"⚠️ Admin command returned no response\n")
                 return str(MessagingResponse())
         else:
-            print(f"❌ {sender} is NOT admin - rejecting")
+            log.warning(f"❌ {sender} is NOT admin - rejecting")
             resp = MessagingResponse()
             resp.message(
                 f"⛔ *Access Denied*\n\n"
@@ -1040,19 +1513,19 @@ def whatsapp_webhook():
                 f"Current admin: {ADMIN_CONTACT}"
             )
             log_auth_attempt(sender, "admin_command_rejected", success=False)
-            print(f"❌ Non-admin rejected\n")
+            log.warning(f"❌ Non-admin rejected\n")
             return str(resp)
     
     # =====================================================================
     # STEP 2: CHECK IF USER IS AUTHORIZED (FOR REGULAR MESSAGES)
     # =====================================================================
     
-    print(f"🔐 Checking user authorization...")
+    log.info(f"🔐 Checking user authorization...")
     is_authorized = is_user_authorized(sender)
-    print(f"   Authorization result: {is_authorized}")
+    log.info(f"   Authorization result: {is_authorized}")
     
     if not is_authorized:
-        print(f"❌ {sender} is NOT authorized")
+        log.warning(f"❌ {sender} is NOT authorized")
         log_auth_attempt(sender, "unauthorized_access", success=False)
         resp = MessagingResponse()
         resp.message(
@@ -1063,34 +1536,24 @@ def whatsapp_webhook():
             f"Ask admin to send:\n"
             f"`ADMIN ADD {sender} YourName 30`"
         )
-        print(f"❌ Unauthorized user rejected\n")
+        log.warning(f"❌ Unauthorized user rejected\n")
         return str(resp)
     
     # ✅ User is authorized - log it
-    print(f"✅ {sender} is AUTHORIZED - proceeding")
-    log_auth_attempt(sender, "authorized_access", success=True)
+    log.info(f"✅ {sender} is AUTHORIZED - proceeding")
+    log_authorized_access(sender)
     
     # =====================================================================
     # STEP 3: HANDLE ONBOARDING & CONVERSATION
     # =====================================================================
     
     # Initialize session if new user
-    if sender not in user_sessions:
-        print(f"🆕 New session for {sender} - starting onboarding")
-        user_sessions[sender] = {
-            "messages": [],
-            "onboarding_step": "basic",
-            "name": None,
-            "age": None,
-            "gender": None,
-            "weight": None,
-            "height": None,
-            "fitness_goal": None,
-            "injury": None,
-            "reminders": [],
-            "last_goal_check": datetime.now(),
-            "user_restrictions": None
-        }
+    session = user_sessions.get(sender)
+    if session is None:
+        log.info(f"🆕 New session for {sender} - starting onboarding")
+        session = Session(last_goal_check=time.time())
+        user_sessions.save(sender, session)
+        schedule_goal_checkin(sender, session.last_goal_check)
 
         greeting = (
             "💪 Hey there! I'm *NexiFit*, your personal fitness companion.\n\n"
@@ -1103,41 +1566,43 @@ def whatsapp_webhook():
 
         resp = MessagingResponse()
         resp.message(greeting)
-        print(f"✅ Greeting sent to {sender}\n")
+        log.info(f"✅ Greeting sent to {sender}\n")
         return str(resp)
 
-    session = user_sessions[sender]
-    
+    # Re-arm the check-in for sessions whose job is missing (e.g. created before jobs were persisted)
+    schedule_goal_checkin(sender, session.last_goal_check)
+
     # ─────────────────────────────────────────────────────────────────
     # STEP 3A: ONBOARDING STEP 1 - BASIC INFO
     # ─────────────────────────────────────────────────────────────────
     
-    if session["onboarding_step"] == "basic":
-        print(f"📝 Processing BASIC onboarding for {sender}")
+    if session.onboarding_step == "basic":
+        log.info(f"📝 Processing BASIC onboarding for {sender}")
         try:
             parts = [p.strip() for p in incoming_msg.split(",")]
-            session["name"] = parts[0] if len(parts) > 0 else None
-            session["age"] = parts[1] if len(parts) > 1 else None
-            session["gender"] = parts[2] if len(parts) > 2 else None
+            session.name = parts[0] if len(parts) > 0 else None
+            session.age = parts[1] if len(parts) > 1 else None
+            session.gender = parts[2] if len(parts) > 2 else None
 
             response_text = (
                 f"✅ Got it!\n"
-                f"- Name: {session['name']}\n"
-                f"- Age: {session['age']}\n"
-                f"- Gender: {session['gender']}\n\n"
+                f"- Name: {session.name}\n"
+                f"- Age: {session.age}\n"
+                f"- Gender: {session.gender}\n\n"
                 f"Do you have any *time & injury restrictions* today?\n\n"
                 f"Example: 'Yes, only 30 minutes' , 'Mild knee pain' , 'No restrictions'"
             )
             
-            session["onboarding_step"] = "restrictions"
+            session.onboarding_step = "restrictions"
+            user_sessions.save(sender, session)
             
             resp = MessagingResponse()
             resp.message(response_text)
-            print(f"✅ Basic info saved, moving to restrictions\n")
+            log.info(f"✅ Basic info saved, moving to restrictions\n")
             return str(resp)
 
         except Exception as e:
-            print(f"❌ Error in basic onboarding: {e}")
+            log.error(f"❌ Error in basic onboarding: {e}")
             resp = MessagingResponse()
             resp.message("⚠️ Please reply in format: Name , Age , Gender\n\nExample: John , 25 , Male")
             return str(resp)
@@ -1146,13 +1611,14 @@ def whatsapp_webhook():
     # STEP 3B: ONBOARDING STEP 1.5 - RESTRICTIONS
     # ─────────────────────────────────────────────────────────────────
     
-    if session["onboarding_step"] == "restrictions":
-        print(f"📝 Processing RESTRICTIONS for {sender}")
-        session["user_restrictions"] = incoming_msg.strip()
-        session["onboarding_step"] = "personalize"
+    if session.onboarding_step == "restrictions":
+        log.info(f"📝 Processing RESTRICTIONS for {sender}")
+        session.user_restrictions = incoming_msg.strip()
+        session.onboarding_step = "personalize"
+        user_sessions.save(sender, session)
 
         response_text = (
-            f"✅ Thanks! I'll remember: '{session['user_restrictions']}'\n\n"
+            f"✅ Thanks! I'll remember: '{session.user_restrictions}'\n\n"
             f"Do you want to make it more personalized?\n\n"
             f"👉 If YES, reply: Weight , Height , Goal , Injuries\n"
             f"👉 If NO, just type: No\n\n"
@@ -1161,63 +1627,65 @@ def whatsapp_webhook():
         
         resp = MessagingResponse()
         resp.message(response_text)
-        print(f"✅ Restrictions saved, asking for personalization\n")
+        log.info(f"✅ Restrictions saved, asking for personalization\n")
         return str(resp)
 
     # ─────────────────────────────────────────────────────────────────
     # STEP 3C: ONBOARDING STEP 2 - PERSONALIZATION
     # ─────────────────────────────────────────────────────────────────
     
-    if session["onboarding_step"] == "personalize":
-        print(f"📝 Processing PERSONALIZATION for {sender}")
+    if session.onboarding_step == "personalize":
+        log.info(f"📝 Processing PERSONALIZATION for {sender}")
         
         if incoming_msg.lower() == "no":
-            print(f"⏭️ User skipped personalization, generating generic plan")
-            session["onboarding_step"] = "done"
-            session["messages"].append(HumanMessage(content="Suggest a personalized starting plan for me."))
+            log.info(f"⏭️ User skipped personalization, generating generic plan")
+            session.onboarding_step = "done"
+            append_message(session, HumanMessage(content="Suggest a personalized starting plan for me."))
+            user_sessions.save(sender, session)
             
             resp = MessagingResponse()
             resp.message("🎯 Okay, preparing a general plan for you...")
             
             # Process async
-            threading.Thread(target=process_and_reply, args=(sender, True)).start()
-            print(f"✅ Generic plan generation started\n")
+            run_async(process_and_reply(sender, True))
+            log.info(f"✅ Generic plan generation started\n")
             return str(resp)
 
         try:
             parts = [p.strip() for p in incoming_msg.split(",")]
-            session["weight"] = parts[0] if len(parts) > 0 else None
-            session["height"] = parts[1] if len(parts) > 1 else None
-            session["fitness_goal"] = parts[2] if len(parts) > 2 else None
-            session["injury"] = parts[3] if len(parts) > 3 else "None"
-            session["onboarding_step"] = "done"
+            session.weight = parts[0] if len(parts) > 0 else None
+            session.height = parts[1] if len(parts) > 1 else None
+            session.fitness_goal = parts[2] if len(parts) > 2 else None
+            session.injury = parts[3] if len(parts) > 3 else "None"
+            session.onboarding_step = "done"
 
             response_text = (
                 f"✅ Perfect! Here's what I know about you:\n\n"
                 f"👤 *Profile:*\n"
-                f"• Name: {session['name']}\n"
-                f"• Age: {session['age']} yrs\n"
-                f"• Gender: {session['gender']}\n"
-                f"• Weight: {session['weight']}\n"
-                f"• Height: {session['height']}\n"
-                f"• Goal: {session['fitness_goal']}\n"
-                f"• Injury: {session['injury']}\n\n"
+                f"• Name: {session.name}\n"
+                f"• Age: {session.age} yrs\n"
+                f"• Gender: {session.gender}\n"
+                f"• Weight: {session.weight}\n"
+                f"• Height: {session.height}\n"
+                f"• Goal: {session.fitness_goal}\n"
+                f"• Injury: {session.injury}\n\n"
                 f"🎯 Creating your personalized plan...\n"
                 f"(This might take 30 seconds)"
             )
 
-            session["messages"].append(HumanMessage(content="Suggest a personalized starting plan for me."))
+            append_message(session, HumanMessage(content="Suggest a personalized starting plan for me."))
+            user_sessions.save(sender, session)
             
             resp = MessagingResponse()
             resp.message(response_text)
             
             # Process async
-            threading.Thread(target=process_and_reply, args=(sender, True)).start()
-            print(f"✅ Personalized plan generation started\n")
+            run_async(process_and_reply(sender, True))
+            log.info(f"✅ Personalized plan generation started\n")
             return str(resp)
             
         except Exception as e:
-            print(f"❌ Error in personalization: {e}")
+            log.error(f"❌ Error in personalization: {e}")
             resp = MessagingResponse()
             resp.message("⚠️ Please reply in format: Weight , Height , Goal , Injuries\n\nExample: 70kg , 5'10\" , Muscle Gain , Mild knee pain")
             return str(resp)
@@ -1226,13 +1694,15 @@ def whatsapp_webhook():
     # STEP 3D: NORMAL CONVERSATION (AFTER ONBOARDING)
     # ─────────────────────────────────────────────────────────────────
     
-    if session["onboarding_step"] == "done":
-        print(f"💬 Processing CONVERSATION for {sender}")
-        msg_lower = incoming_msg.lower().strip()
+    if session.onboarding_step == "done":
+        log.info(f"💬 Processing CONVERSATION for {sender}")
+        # Lower-cased once and reused by every check in this branch
+        msg_lower = incoming_msg.lower()
+        command = _EXACT_COMMANDS.get(msg_lower)
         
         # STREAK COMMANDS
-        if msg_lower in ['streak', 'my streak', 'check streak', 'show streak', 'streak stats']:
-            print(f"📊 Processing streak command")
+        if command == 'streak':
+            log.info(f"📊 Processing streak command")
             streak_data = get_user_streak(sender)
             current = streak_data['current_streak']
             longest = streak_data['longest_streak']
@@ -1259,96 +1729,99 @@ def whatsapp_webhook():
             
             resp = MessagingResponse()
             resp.message(message)
-            print(f"✅ Streak info sent\n")
+            log.info(f"✅ Streak info sent\n")
             return str(resp)
         
         # TIP OPT-OUT
-        if msg_lower in ['stop tips', 'no tips', 'disable tips', 'unsubscribe tips']:
-            print(f"🔕 Disabling tips for {sender}")
+        if command == 'tips_off':
+            log.info(f"🔕 Disabling tips for {sender}")
             set_user_tip_preference(sender, False)
             resp = MessagingResponse()
             resp.message("✅ You've unsubscribed from daily tips.\n\nYou can re-enable with: 'START TIPS'")
-            print(f"✅ Tips disabled\n")
+            log.info(f"✅ Tips disabled\n")
             return str(resp)
         
         # TIP OPT-IN
-        if msg_lower in ['start tips', 'enable tips', 'resume tips', 'subscribe tips']:
-            print(f"🔔 Enabling tips for {sender}")
+        if command == 'tips_on':
+            log.info(f"🔔 Enabling tips for {sender}")
             set_user_tip_preference(sender, True)
             resp = MessagingResponse()
             resp.message("✅ Daily mental health tips enabled!\n\nYou'll get a tip at 7:00 AM every day. 🌅")
-            print(f"✅ Tips enabled\n")
+            log.info(f"✅ Tips enabled\n")
             return str(resp)
         
         # REMINDERS
         if "remind" in msg_lower:
-            print(f"⏰ Processing reminder request")
+            log.info(f"⏰ Processing reminder request")
             try:
-                task, run_time = parse_reminder_message(incoming_msg)
+                task, run_time = parse_reminder_message(msg_lower)
                 if task and run_time:
-                    session["reminders"].append({"text": task, "time": run_time})
+                    session.reminders.append({"text": task, "time": run_time})
+                    user_sessions.save(sender, session)
                     schedule_reminder(sender, task, run_time)
                     resp = MessagingResponse()
                     resp.message(f"✅ Reminder set!\n'{task}' at {run_time.strftime('%H:%M')}")
-                    print(f"✅ Reminder scheduled\n")
+                    log.info(f"✅ Reminder scheduled\n")
                     return str(resp)
                 else:
                     raise ValueError("Invalid format")
             except Exception as e:
-                print(f"❌ Reminder error: {e}")
+                log.error(f"❌ Reminder error: {e}")
                 resp = MessagingResponse()
                 resp.message("⚠️ Invalid reminder format.\nUse:\n• Remind me to <task> in <minutes>\n• Remind me to <task> at <HH:MM>")
                 return str(resp)
         
         # WEEKLY PLAN
-        if any(word in msg_lower for word in ["weekly plan", "week plan", "7 day", "weekly workout"]):
-            print(f"📅 Processing weekly plan request")
-            session["messages"].append(HumanMessage(
-                content=f"Create a complete weekly workout plan (Monday to Sunday) for me based on my goal: {session['fitness_goal']}. "
+        if _WEEKLY_PLAN_RE.search(msg_lower):
+            log.info(f"📅 Processing weekly plan request")
+            append_message(session, HumanMessage(
+                content=f"Create a complete weekly workout plan (Monday to Sunday) for me based on my goal: {session.fitness_goal}. "
                         f"Include rest days and specify which muscle groups to target each day."
             ))
+            user_sessions.save(sender, session)
             resp = MessagingResponse()
             resp.message("📅 Creating your weekly workout plan...")
-            threading.Thread(target=process_and_reply, args=(sender, True)).start()
-            print(f"✅ Weekly plan generation started\n")
+            run_async(process_and_reply(sender, True))
+            log.info(f"✅ Weekly plan generation started\n")
             return str(resp)
         
         # TODAY'S PLAN
-        if any(word in msg_lower for word in ["today", "today's plan", "plan for today", "workout today"]):
-            print(f"📋 Processing today's plan request")
-            session["messages"].append(HumanMessage(content="What's my workout plan for today?"))
+        if _TODAY_PLAN_RE.search(msg_lower):
+            log.info(f"📋 Processing today's plan request")
+            append_message(session, HumanMessage(content="What's my workout plan for today?"))
+            user_sessions.save(sender, session)
             resp = MessagingResponse()
             resp.message("📋 Preparing your workout plan for today...")
-            threading.Thread(target=process_and_reply, args=(sender, True)).start()
-            print(f"✅ Today's plan generation started\n")
+            run_async(process_and_reply(sender, True))
+            log.info(f"✅ Today's plan generation started\n")
             return str(resp)
         
         # FITNESS RELEVANCE CHECK
-        if not is_fitness_related(incoming_msg):
-            print(f"⚠️ Non-fitness message from {sender}")
+        if not is_fitness_related(incoming_msg, msg_lower):
+            log.warning(f"⚠️ Non-fitness message from {sender}")
             resp = MessagingResponse()
             resp.message(
                 "⚠️ I specialize in fitness topics like workouts, diet, nutrition, and exercise.\n\n"
                 "Feel free to ask me anything about your fitness journey! 💪"
             )
-            print(f"⚠️ Non-fitness message rejected\n")
+            log.warning(f"⚠️ Non-fitness message rejected\n")
             return str(resp)
         
         # REGULAR CONVERSATION
-        print(f"💬 Processing normal fitness conversation")
-        session["messages"].append(HumanMessage(content=incoming_msg))
+        log.info(f"💬 Processing normal fitness conversation")
+        append_message(session, HumanMessage(content=incoming_msg))
+        user_sessions.save(sender, session)
         resp = MessagingResponse()
         resp.message("✅ Got it! Let me help you with that...")
         
-        msg_lower = incoming_msg.lower()
-        is_plan_request = any(word in msg_lower for word in ["plan", "workout", "today", "weekly", "routine"])
+        is_plan_request = _PLAN_REQUEST_RE.search(msg_lower) is not None
         
-        threading.Thread(target=process_and_reply, args=(sender, is_plan_request, incoming_msg)).start()
-        print(f"✅ Processing response\n")
+        run_async(process_and_reply(sender, is_plan_request, incoming_msg))
+        log.info(f"✅ Processing response\n")
         return str(resp)
     
     # Fallback (should never reach here)
-    print(f"❓ Unknown state for {sender}")
+    log.info(f"❓ Unknown state for {sender}")
     resp = MessagingResponse()
     resp.message("⚠️ Something went wrong. Please try again.")
     return str(resp)
@@ -1356,24 +1829,63 @@ def whatsapp_webhook():
 # -------------------------
 # Weekly Goal Check Feature
 # -------------------------
-def weekly_goal_check():
-    while True:
-        now = datetime.now()
-        for phone, data in user_sessions.items():
-            try:
-                last_check = data.get("last_goal_check")
-                if last_check and (now - last_check).days >= 7:
-                    client.messages.create(
-                        from_=TWILIO_WHATSAPP_NUMBER,
-                        to=phone,
-                        body="It's been a week! Would you like to update your fitness goal or weight?"
-                    )
-                    data["last_goal_check"] = now
-            except Exception as e:
-                print("Weekly goal check error:", e)
-        threading.Event().wait(86400)
+GOAL_CHECK_INTERVAL_SECONDS = 7 * 24 * 3600
+
+GOAL_CHECK_MESSAGE = "It's been a week! Would you like to update your fitness goal or weight?"
+
+def _goal_check_epoch(last_check):
+    """Epoch seconds; sessions saved before the switch may still hold a datetime."""
+    if isinstance(last_check, datetime):
+        return last_check.timestamp()
+    return last_check
+
+def send_goal_checkin(phone):
+    """Weekly per-user job (id goal:<phone>) asking the user to update their goal or weight."""
+    session = user_sessions.get(phone)
+    if session is None:
+        # Session expired or was dropped; nothing left to check in on
+        scheduler.remove_job(f"goal:{phone}")
+        _goal_checkins_armed.discard(phone)
+        return
+    now = time.time()
+    last_check = _goal_check_epoch(session.last_goal_check)
+    # Another worker may already have sent this week's check-in
+    if last_check and now - last_check < GOAL_CHECK_INTERVAL_SECONDS - 3600:
+        return
+    try:
+        send_whatsapp_message(phone, GOAL_CHECK_MESSAGE)
+        session.last_goal_check = now
+        user_sessions.save(phone, session)
+    except Exception as e:
+        log.error("Weekly goal check error: %s", e)
 
-threading.Thread(target=weekly_goal_check, daemon=True).start()
+# Phones this process has already armed or found in the job store, so the per-message
+# call stays an in-memory check instead of a job store query
+_goal_checkins_armed = set()
+
+def schedule_goal_checkin(phone, last_check):
+    """Ensure phone has its weekly check-in job, counted from its last goal check."""
+    if phone in _goal_checkins_armed:
+        return
+    _goal_checkins_armed.add(phone)
+    job_id = f"goal:{phone}"
+    if scheduler.get_job(job_id):
+        return
+    now = time.time()
+    # Overdue check-ins (e.g. missed while the app was down) go out right away
+    due = max((_goal_check_epoch(last_check) or now) + GOAL_CHECK_INTERVAL_SECONDS, now)
+    scheduler.add_job(
+        send_goal_checkin,
+        'interval',
+        seconds=GOAL_CHECK_INTERVAL_SECONDS,
+        start_date=datetime.fromtimestamp(due),
+        next_run_time=datetime.fromtimestamp(due),
+        args=[phone],
+        id=job_id,
+        name='Weekly Goal Check',
+        jobstore='persistent',
+        replace_existing=True
+    )
 
 
 def initialize_database():
@@ -1386,21 +1898,28 @@ def initialize_database():
     # OPTIONAL: Delete old database (ONLY for testing - remove in production)
     if os.path.exists(db_file):
         os.remove(db_file)
-        print("🔄 OLD DATABASE DELETED - FRESH START")
+        # Drop the WAL files too, or sqlite could replay them into the fresh database
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db_file + suffix):
+                os.remove(db_file + suffix)
+        log.info("🔄 OLD DATABASE DELETED - FRESH START")
     
-    print(f"\n{'='*60}")
-    print(f"📂 Database Path: {db_file}")
-    print(f"{'='*60}\n")
+    log.info(f"\n{'='*60}")
+    log.info(f"📂 Database Path: {db_file}")
+    log.info(f"{'='*60}\n")
     
     # Step 1: Connect to database
     conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
+    # WAL is stored in the database file, so setting it once here covers every later connection;
+    # readers then run alongside the writer
+    cursor.execute('PRAGMA journal_mode=WAL')
     
     # ============================================
     # STEP 2: CREATE ALL TABLES FIRST (CRITICAL!)
     # ============================================
     
-    print("📋 Creating database tables...")
+    log.info("📋 Creating database tables...")
     
     # 1. ADMIN USERS TABLE (Create FIRST - most important)
     cursor.execute('''
@@ -1411,7 +1930,7 @@ def initialize_database():
             date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    print("  ✅ admin_users table created")
+    log.info("  ✅ admin_users table created")
     
     # 2. AUTHORIZED USERS TABLE
     cursor.execute('''
@@ -1425,7 +1944,7 @@ def initialize_database():
             notes TEXT
         )
     ''')
-    print("  ✅ authorized_users table created")
+    log.info("  ✅ authorized_users table created")
     
     # 3. AUTH LOGS TABLE
     cursor.execute('''
@@ -1437,7 +1956,7 @@ def initialize_database():
             success INTEGER DEFAULT 0
         )
     ''')
-    print("  ✅ auth_logs table created")
+    log.info("  ✅ auth_logs table created")
     
     # 4. WORKOUT LOGS TABLE
     cursor.execute('''
@@ -1456,7 +1975,7 @@ def initialize_database():
         CREATE INDEX IF NOT EXISTS idx_workout_logs_phone_date 
         ON workout_logs(phone_number, date_completed)
     ''')
-    print("  ✅ workout_logs table created")
+    log.info("  ✅ workout_logs table created")
     
     # 5. MENTAL HEALTH TIPS TABLE
     cursor.execute('''
@@ -1468,7 +1987,7 @@ def initialize_database():
             active INTEGER DEFAULT 1
         )
     ''')
-    print("  ✅ mental_health_tips table created")
+    log.info("  ✅ mental_health_tips table created")
     
     # 6. USER TIP PREFERENCES TABLE
     cursor.execute('''
@@ -1479,7 +1998,7 @@ def initialize_database():
             last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    print("  ✅ user_tip_preferences table created")
+    log.info("  ✅ user_tip_preferences table created")
     
     # 7. USER TIP HISTORY TABLE
     cursor.execute('''
@@ -1501,7 +2020,7 @@ def initialize_database():
         CREATE INDEX IF NOT EXISTS idx_user_tip_history_date 
         ON user_tip_history(sent_date)
     ''')
-    print("  ✅ user_tip_history table created")
+    log.info("  ✅ user_tip_history table created")
     
     # 8. WORKOUT STREAKS TABLE
     cursor.execute('''
@@ -1513,11 +2032,11 @@ def initialize_database():
             last_workout_date DATE
         )
     ''')
-    print("  ✅ workout_streaks table created")
+    log.info("  ✅ workout_streaks table created")
     
     # Commit table creation
     conn.commit()
-    print("\n✅ ALL TABLES CREATED SUCCESSFULLY!\n")
+    log.info("\n✅ ALL TABLES CREATED SUCCESSFULLY!\n")
     
     # ============================================
     # STEP 3: NOW INSERT ADMIN (After tables exist)
@@ -1525,9 +2044,9 @@ def initialize_database():
     
     default_admin = "whatsapp:+918667643749"
     
-    print(f"{'='*60}")
-    print(f"🔐 SETTING UP ADMIN: {default_admin}")
-    print(f"{'='*60}")
+    log.info(f"{'='*60}")
+    log.info(f"🔐 SETTING UP ADMIN: {default_admin}")
+    log.info(f"{'='*60}")
     
     # Insert into admin_users table
     cursor.execute('''
@@ -1554,26 +2073,46 @@ def initialize_database():
     auth_check = cursor.fetchone()
     
     if admin_check and auth_check:
-        print(f"✅ ADMIN SUCCESSFULLY INSERTED:")
-        print(f"   📱 Phone: {default_admin}")
-        print(f"   👤 Name: Kishore")
-        print(f"   🔐 Admin Table: ✅")
-        print(f"   ✅ Auth Table: ✅")
+        log.info(f"✅ ADMIN SUCCESSFULLY INSERTED:")
+        log.info(f"   📱 Phone: {default_admin}")
+        log.info(f"   👤 Name: Kishore")
+        log.info(f"   🔐 Admin Table: ✅")
+        log.info(f"   ✅ Auth Table: ✅")
     else:
-        print(f"❌ ADMIN INSERTION FAILED!")
-        print(f"   Admin Table: {'✅' if admin_check else '❌'}")
-        print(f"   Auth Table: {'✅' if auth_check else '❌'}")
+        log.error(f"❌ ADMIN INSERTION FAILED!")
+        log.error(f"   Admin Table: {'✅' if admin_check else '❌'}")
+        log.error(f"   Auth Table: {'✅' if auth_check else '❌'}")
     
-    print(f"{'='*60}\n")
+    log.info(f"{'='*60}\n")
     
     conn.close()
     
-    print("✅ Database initialization complete!\n")
+    log.info("✅ Database initialization complete!\n")
 
 
 # Initialize database ONCE at startup
 initialize_database()
 
+# Start only now: the scheduler restores overdue persisted jobs as soon as it starts,
+# and their send_reminder / send_goal_checkin references must already resolve
+scheduler.start()
+log.info("✅ Scheduler started")
+
+# Set to 0 when the app is imported in a parent process that forks workers (gunicorn --preload)
+WARM_UP_ON_START = os.environ.get("WARM_UP_ON_START", "1") == "1"
+
+def warm_up():
+    """Create the Gemini model and Twilio client before the first message needs them."""
+    try:
+        get_llm()
+        get_client()
+        log.info("✅ Gemini and Twilio clients ready")
+    except Exception as e:
+        log.warning(f"⚠️ Warm-up failed, clients will be created on first use: {e}")
+
+if WARM_UP_ON_START:
+    threading.Thread(target=warm_up, name="nexifit-warmup", daemon=True).start()
+
 @app.route("/health")
 def health():
     return "OK", 200
@@ -1,16 +1,54 @@
 import sqlite3
 import os
+import logging
+import queue
+import threading
+import time
+import atexit
 from datetime import datetime, date
 from contextlib import contextmanager
 import random
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
 
 DB_NAME = os.environ.get('DB_PATH', '/data/nexifit_users.db')  # Changed default from /tmp/
 
+# Child of the app's "nexifit" logger, so records go through its queue handler
+log = logging.getLogger("nexifit.database")
+
+# Auth lookups run on every inbound message; cache them so a chatty user costs one
+# DB query per TTL instead of one per message. Admin ADD/REMOVE/REACTIVATE and the
+# expiry cleanup invalidate entries, so the TTL only bounds staleness of expiry dates
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 10000))
+AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', 300))
+_auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+_admin_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+_auth_cache_lock = threading.Lock()
+
+# Flask serves each webhook request on a new thread, so connections are pooled
+# process-wide rather than per thread. Connections are opened on demand and up to
+# DB_POOL_SIZE idle ones are kept for reuse; the rest are closed after use
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+_connection_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+def _new_connection():
+    """Open a sqlite connection with the per-connection PRAGMAs (WAL itself is set once in initialize_database)."""
+    # Pooled connections move between threads; each is used by one thread at a time
+    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+    conn.row_factory = sqlite3.Row  # Access columns by name
+    # NORMAL only fsyncs at WAL checkpoints
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')
+    return conn
+
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row  # Access columns by name
+    """Context manager for database connections. Commits on success, rolls back on error."""
+    try:
+        conn = _connection_pool.get_nowait()
+    except queue.Empty:
+        conn = _new_connection()
     try:
         yield conn
         conn.commit()
@@ -18,12 +56,16 @@ def get_db_connection():
         conn.rollback()
         raise e
     finally:
-        conn.close()
+        try:
+            _connection_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
 
 # =====================
 # AUTHENTICATION FUNCTIONS (FIXED)
 # =====================
 
+@cached(_auth_cache, lock=_auth_cache_lock)
 def is_user_authorized(phone_number):
     """
     Check if a phone number is authorized AND not expired.
@@ -40,7 +82,7 @@ def is_user_authorized(phone_number):
         ''', (phone_number,))
         
         if cursor.fetchone():
-            print(f"✅ {phone_number} is ADMIN - auto-authorized")
+            log.info(f"✅ {phone_number} is ADMIN - auto-authorized")
             return True
         
         # Now check regular authorized_users
@@ -74,11 +116,12 @@ def is_user_authorized(phone_number):
                 if datetime.now() > expiry_date:
                     return False  # Expired
             except ValueError as e:
-                print(f"Warning: Invalid expiry_date format for {phone_number}: {expiry_date_str}")
+                log.warning(f"Warning: Invalid expiry_date format for {phone_number}: {expiry_date_str}")
                 pass
         
         return True
 
+@cached(_admin_cache, lock=_auth_cache_lock)
 def is_admin(phone_number):
     """Check if a phone number is an admin."""
     ensure_all_tables_exist()  # ENSURE TABLES EXIST FIRST
@@ -91,32 +134,114 @@ def is_admin(phone_number):
         result = cursor.fetchone() is not None
         
         if result:
-            print(f"✅ {phone_number} verified as ADMIN")
+            log.info(f"✅ {phone_number} verified as ADMIN")
         else:
-            print(f"❌ {phone_number} is NOT an admin")
+            log.warning(f"❌ {phone_number} is NOT an admin")
         
         return result
 
+def invalidate_auth_cache(phone_number=None):
+    """Drop cached auth results for one number, or for everyone if no number is given."""
+    with _auth_cache_lock:
+        if phone_number is None:
+            _auth_cache.clear()
+            _admin_cache.clear()
+        else:
+            _auth_cache.pop(hashkey(phone_number), None)
+            _admin_cache.pop(hashkey(phone_number), None)
+
 def log_auth_attempt(phone_number, action, success=False):
-    """Log authentication attempts for security."""
-    ensure_all_tables_exist()  # ENSURE TABLES EXIST FIRST
-    
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO auth_logs (phone_number, action, success)
-            VALUES (?, ?, ?)
-        ''', (phone_number, action, 1 if success else 0))
+    """Log authentication attempts for security. Rows are written in batches by the auth log writer."""
+    _auth_log_queue.put((phone_number, action, 1 if success else 0))
+
+# =====================
+# AUTH LOG WRITER
+# =====================
+
+# Every inbound message logs an auth attempt; writing them in batches keeps
+# sqlite's write lock and commit off the webhook path
+AUTH_LOG_BATCH_SIZE = 100
+AUTH_LOG_FLUSH_SECONDS = 1.0
+_auth_log_queue = queue.Queue()
+
+def _write_auth_logs(rows):
+    """Insert a batch of (phone_number, action, success) rows in one transaction."""
+    try:
+        ensure_all_tables_exist()
+        with get_db_connection() as conn:
+            conn.executemany('''
+                INSERT INTO auth_logs (phone_number, action, success)
+                VALUES (?, ?, ?)
+            ''', rows)
+    except Exception as e:
+        log.error(f"Error writing auth logs: {e}")
+
+# Queued by flush_auth_logs at exit: the writer saves its current batch and returns
+_AUTH_LOG_STOP = object()
+
+def _auth_log_writer():
+    """Collect queued rows for up to AUTH_LOG_FLUSH_SECONDS (or a full batch), then write them."""
+    while True:
+        row = _auth_log_queue.get()
+        if row is _AUTH_LOG_STOP:
+            return
+        rows = [row]
+        stopping = False
+        deadline = time.monotonic() + AUTH_LOG_FLUSH_SECONDS
+        while len(rows) < AUTH_LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = _auth_log_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _AUTH_LOG_STOP:
+                stopping = True
+                break
+            rows.append(row)
+        _write_auth_logs(rows)
+        if stopping:
+            return
+
+_auth_log_thread = threading.Thread(target=_auth_log_writer, name="nexifit-auth-log", daemon=True)
+
+def flush_auth_logs():
+    """
+    Stop the writer once everything queued so far is saved, including the batch it is holding.
+    Registered at exit so pending rows aren't lost.
+    """
+    _auth_log_queue.put(_AUTH_LOG_STOP)
+    _auth_log_thread.join()
+    # Rows logged while the writer was stopping
+    rows = []
+    while True:
+        try:
+            rows.append(_auth_log_queue.get_nowait())
+        except queue.Empty:
+            break
+    if rows:
+        _write_auth_logs(rows)
+
+_auth_log_thread.start()
+atexit.register(flush_auth_logs)
 
 # =====================
 # INITIALIZATION FUNCTION (FIXED)
 # =====================
 
+_tables_ready = False
+
 def ensure_all_tables_exist():
     """
     Create all required tables if they don't exist.
     This is the MAIN FIX - called at startup and before each operation.
+    The CREATE statements only run until they succeed once per process.
     """
+    global _tables_ready
+    if _tables_ready:
+        return True
+
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
@@ -232,10 +357,11 @@ def ensure_all_tables_exist():
             ''')
             
             conn.commit()
+            _tables_ready = True
             return True
             
     except Exception as e:
-        print(f"❌ Error creating tables: {e}")
+        log.error(f"❌ Error creating tables: {e}")
         return False
 
 # =====================
@@ -266,7 +392,8 @@ def add_user(phone_number, name=None, expiry_days=None):
                 VALUES (?, 1)
             ''', (phone_number,))
             
-            return True, "User added successfully!"
+        invalidate_auth_cache(phone_number)
+        return True, "User added successfully!"
     except sqlite3.IntegrityError:
         return False, "User already exists in database"
     except Exception as e:
@@ -283,11 +410,14 @@ def remove_user(phone_number):
             SET authorized = 0 
             WHERE phone_number = ?
         ''', (phone_number,))
-        
-        if cursor.rowcount > 0:
-            return True, "User deactivated successfully!"
-        else:
-            return False, "User not found"
+        updated = cursor.rowcount > 0
+    
+    # Invalidate after the commit so a concurrent lookup can't re-cache the old status
+    if updated:
+        invalidate_auth_cache(phone_number)
+        return True, "User deactivated successfully!"
+    else:
+        return False, "User not found"
 
 def reactivate_user(phone_number):
     """Reactivate a previously deactivated user."""
@@ -300,11 +430,13 @@ def reactivate_user(phone_number):
             SET authorized = 1 
             WHERE phone_number = ?
         ''', (phone_number,))
-        
-        if cursor.rowcount > 0:
-            return True, "User reactivated successfully!"
-        else:
-            return False, "User not found"
+        updated = cursor.rowcount > 0
+    
+    if updated:
+        invalidate_auth_cache(phone_number)
+        return True, "User reactivated successfully!"
+    else:
+        return False, "User not found"
 
 def list_all_users():
     """Get list of all users."""
@@ -357,9 +489,11 @@ def clean_expired_users():
             AND authorized = 1
         ''')
         count = cursor.rowcount
-        if count > 0:
-            print(f"🧹 Cleaned {count} expired users")
-        return count
+    
+    if count > 0:
+        invalidate_auth_cache()
+        log.info(f"🧹 Cleaned {count} expired users")
+    return count
 
 # =====================
 # MENTAL HEALTH TIPS FUNCTIONS
@@ -502,7 +636,66 @@ def log_tip_sent(phone_number, tip_id):
             ''', (phone_number, tip_id))
             return True
     except Exception as e:
-        print(f"Error logging tip: {e}")
+        log.error(f"Error logging tip: {e}")
+        return False
+
+def get_next_tips_bulk(phone_numbers):
+    """
+    Same rotation as get_next_tip_for_user, for many users in one pass.
+    Returns {phone_number: tip_row}; empty if there are no active tips.
+    """
+    ensure_all_tables_exist()  # ENSURE TABLES EXIST FIRST
+    
+    phone_numbers = list(phone_numbers)
+    if not phone_numbers:
+        return {}
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Get all active tips
+        cursor.execute('SELECT * FROM mental_health_tips WHERE active = 1')
+        tips_by_id = {row['id']: row for row in cursor.fetchall()}
+        
+        if not tips_by_id:
+            return {}
+        
+        # Tips sent to these users in the last 15 days, grouped per user
+        placeholders = ','.join('?' * len(phone_numbers))
+        cursor.execute(f'''
+            SELECT DISTINCT phone_number, tip_id
+            FROM user_tip_history
+            WHERE sent_date >= date('now', '-15 days')
+            AND phone_number IN ({placeholders})
+        ''', phone_numbers)
+        recent_tips = {}
+        for row in cursor.fetchall():
+            recent_tips.setdefault(row['phone_number'], set()).add(row['tip_id'])
+    
+    all_tips = list(tips_by_id)
+    next_tips = {}
+    for phone_number in phone_numbers:
+        recent = recent_tips.get(phone_number, ())
+        # Get available tips (not sent recently); if none, reset and use all tips
+        available_tips = [tip_id for tip_id in all_tips if tip_id not in recent] or all_tips
+        next_tips[phone_number] = tips_by_id[random.choice(available_tips)]
+    
+    return next_tips
+
+def log_tips_sent_bulk(entries):
+    """Log many (phone_number, tip_id) sends in one transaction."""
+    ensure_all_tables_exist()  # ENSURE TABLES EXIST FIRST
+    
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO user_tip_history (phone_number, tip_id, sent_date)
+                VALUES (?, ?, date('now'))
+            ''', entries)
+            return True
+    except Exception as e:
+        log.error(f"Error logging tips: {e}")
         return False
 
 # =====================
@@ -525,7 +718,7 @@ def set_user_tip_preference(phone_number, receive_tips=True):
             ''', (phone_number, 1 if receive_tips else 0, 1 if receive_tips else 0))
             return True
     except Exception as e:
-        print(f"Error setting tip preference: {e}")
+        log.error(f"Error setting tip preference: {e}")
         return False
 
 def get_user_tip_preference(phone_number):
@@ -546,8 +739,11 @@ def get_user_tip_preference(phone_number):
         
         return result
 
-def get_users_for_daily_tips():
-    """Get all users who should receive daily tips."""
+def get_users_for_daily_tips(after_phone='', limit=-1):
+    """
+    Get users who should receive daily tips, ordered by phone number.
+    Page through them by passing the last phone number seen as after_phone.
+    """
     ensure_all_tables_exist()  # ENSURE TABLES EXIST FIRST
     
     with get_db_connection() as conn:
@@ -558,7 +754,10 @@ def get_users_for_daily_tips():
             LEFT JOIN user_tip_preferences utp ON au.phone_number = utp.phone_number
             WHERE au.authorized = 1
             AND (utp.receive_tips IS NULL OR utp.receive_tips = 1)
-        ''')
+            AND au.phone_number > ?
+            ORDER BY au.phone_number
+            LIMIT ?
+        ''', (after_phone, limit))
         return cursor.fetchall()
 
 # =====================
@@ -658,7 +857,7 @@ def log_workout_completion(phone_number, workout_minutes, calories_burned, progr
             ''', (phone_number, workout_minutes, calories_burned, progress_percent, goal))
             return True
     except Exception as e:
-        print(f"Error logging workout: {e}")
+        log.error(f"Error logging workout: {e}")
         return False
 
 def get_weekly_progress(phone_number):
@@ -691,8 +890,11 @@ def get_weekly_progress(phone_number):
             }
         return None
 
-def get_users_for_weekly_report():
-    """Get all active users for sending weekly reports."""
+def get_users_for_weekly_report(after_phone='', limit=-1):
+    """
+    Get active users for sending weekly reports, ordered by phone number.
+    Page through them by passing the last phone number seen as after_phone.
+    """
     ensure_all_tables_exist()  # ENSURE TABLES EXIST FIRST
     
     with get_db_connection() as conn:
@@ -701,7 +903,10 @@ def get_users_for_weekly_report():
             SELECT phone_number, name 
             FROM authorized_users 
             WHERE authorized = 1
-        ''')
+            AND phone_number > ?
+            ORDER BY phone_number
+            LIMIT ?
+        ''', (after_phone, limit))
         return cursor.fetchall()
 
 # =====================
@@ -795,10 +1000,10 @@ def initialize_streak_tracking():
                 )
             ''')
             
-            print("✅ Streak tracking table initialized!")
+            log.info("✅ Streak tracking table initialized!")
             return True
     except Exception as e:
-        print(f"❌ Error initializing streak tracking: {e}")
+        log.error(f"❌ Error initializing streak tracking: {e}")
         return False
 
 
@@ -838,7 +1043,7 @@ def update_workout_streak(phone_number):
                 INSERT INTO workout_streaks (phone_number, current_streak, longest_streak, last_workout_date)
                 VALUES (?, 1, 1, ?)
             ''', (phone_number, today))
-            print(f"🎉 First workout logged for {phone_number}")
+            log.info(f"🎉 First workout logged for {phone_number}")
             return (1, True, False)
         
         # ── EXISTING USER ────────────────────────────
@@ -854,20 +1059,20 @@ def update_workout_streak(phone_number):
         
         # ── SAME DAY (Already worked out today) ──────
         if last_date == today:
-            print(f"ℹ️ Workout already logged today for {phone_number}")
+            log.info(f"ℹ️ Workout already logged today for {phone_number}")
             return (current_streak, False, False)
         
         # ── CONSECUTIVE DAY (Yesterday) ──────────────
         if last_date == today - timedelta(days=1):
             current_streak += 1
             broke_streak = False
-            print(f"🔥 Streak continues! {current_streak} days for {phone_number}")
+            log.info(f"🔥 Streak continues! {current_streak} days for {phone_number}")
         
         # ── STREAK BROKEN (Gap detected) ─────────────
         elif last_date and last_date < today - timedelta(days=1):
             current_streak = 1
             broke_streak = True
-            print(f"🌱 Streak reset for {phone_number}. Starting fresh!")
+            log.info(f"🌱 Streak reset for {phone_number}. Starting fresh!")
         
         # ── EDGE CASE (First workout or unusual scenario) ──
         else:
@@ -878,7 +1083,7 @@ def update_workout_streak(phone_number):
         is_new_record = current_streak > longest_streak
         if is_new_record:
             longest_streak = current_streak
-            print(f"🏆 NEW RECORD! {current_streak} days for {phone_number}")
+            log.info(f"🏆 NEW RECORD! {current_streak} days for {phone_number}")
         
         # ── UPDATE DATABASE ──────────────────────────
         cursor.execute('''
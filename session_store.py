@@ -0,0 +1,191 @@
+import os
+import logging
+import threading
+import orjson
+from cachetools import LRUCache
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+REDIS_URL = os.environ.get("REDIS_URL")
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", 7 * 24 * 3600))
+SESSION_KEY_PREFIX = "nexifit:session:"
+JOB_LOCK_PREFIX = "nexifit:lock:"
+log = logging.getLogger("nexifit.sessions")
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 50))
+# In-memory store only: most sessions kept before the least recently used is evicted
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", 10000))
+
+# =====================
+# SESSION MODEL
+# =====================
+
+@dataclass(slots=True)
+class Session:
+    """Per-user conversation state. Slots keep each instance small with many users in memory."""
+    messages: list = field(default_factory=list)
+    onboarding_step: str = "basic"
+    name: str | None = None
+    age: str | None = None
+    gender: str | None = None
+    weight: str | None = None
+    height: str | None = None
+    fitness_goal: str | None = None
+    injury: str | None = None
+    reminders: list = field(default_factory=list)
+    last_goal_check: float = 0.0
+    user_restrictions: str | None = None
+    latest_streak: dict | None = None
+    last_message_at: float = 0.0
+
+    def profile(self):
+        """Profile fields as a plain dict, for helpers that take user_data dicts."""
+        return {
+            "name": self.name,
+            "age": self.age,
+            "gender": self.gender,
+            "weight": self.weight,
+            "height": self.height,
+            "fitness_goal": self.fitness_goal,
+            "injury": self.injury,
+        }
+
+_SESSION_FIELDS = tuple(f.name for f in fields(Session))
+
+# =====================
+# SERIALIZATION
+# =====================
+
+def _encode_value(value):
+    """orjson fallback for tagged types (datetimes in reminders/goal checks)."""
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Cannot serialize {type(value).__name__} in session")
+
+def _decode_value(obj):
+    """Walk decoded JSON and turn {"$datetime": ...} tags back into datetimes."""
+    if isinstance(obj, dict):
+        if "$datetime" in obj and len(obj) == 1:
+            return datetime.fromisoformat(obj["$datetime"])
+        return {key: _decode_value(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_decode_value(value) for value in obj]
+    return obj
+
+def serialize_session(session):
+    """Session -> JSON bytes. LangChain messages are stored via messages_to_dict."""
+    data = {name: getattr(session, name) for name in _SESSION_FIELDS}
+    data["messages"] = messages_to_dict(session.messages)
+    # Passthrough makes orjson hand datetimes to _encode_value so they round-trip as datetimes
+    return orjson.dumps(data, default=_encode_value, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+def deserialize_session(raw):
+    """JSON string/bytes -> Session with LangChain message objects restored."""
+    data = orjson.loads(raw)
+    messages = data.pop("messages", [])
+    data = _decode_value(data)
+    # Ignore keys from older/newer deployments that the Session model doesn't know
+    session = Session(**{name: data[name] for name in _SESSION_FIELDS if name in data})
+    session.messages = messages_from_dict(messages)
+    return session
+
+# =====================
+# SESSION STORES
+# =====================
+
+class InMemorySessionStore:
+    """
+    Process-local sessions. Fine for a single worker; state is lost on restart.
+    Bounded by max_size with LRU eviction. There is no idle expiry, so a user who goes
+    quiet keeps their profile (and their goal check-ins) until evicted or restarted.
+    """
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE):
+        self._sessions = LRUCache(maxsize=max_size)
+        # Webhook, scheduler and async worker threads all touch the store
+        self._lock = threading.Lock()
+
+    def get(self, sender):
+        with self._lock:
+            return self._sessions.get(sender)
+
+    def save(self, sender, session):
+        with self._lock:
+            self._sessions[sender] = session
+
+    def update(self, sender, mutate):
+        """Apply mutate to the stored session under the lock and save it; None if there is no session."""
+        with self._lock:
+            session = self._sessions.get(sender)
+            if session is None:
+                return None
+            mutate(session)
+            self._sessions[sender] = session
+            return session
+
+    def claim(self, name, ttl):
+        """Whether this process should run the job run `name`. Always true: there is only one process."""
+        return True
+
+
+class RedisSessionStore:
+    """
+    Sessions shared by every worker through Redis.
+    One JSON blob per sender under nexifit:session:<sender>, expiring after SESSION_TTL_SECONDS.
+    """
+
+    def __init__(self, url, ttl=SESSION_TTL_SECONDS):
+        import redis  # Only needed when REDIS_URL is configured
+
+        # One bounded pool per process, shared by the webhook threads and the scheduler
+        pool = redis.ConnectionPool.from_url(url, max_connections=REDIS_MAX_CONNECTIONS)
+        self._redis = redis.Redis(connection_pool=pool)
+        self._ttl = ttl
+        self._watch_error = redis.WatchError
+
+    def _key(self, sender):
+        return f"{SESSION_KEY_PREFIX}{sender}"
+
+    def get(self, sender):
+        raw = self._redis.get(self._key(sender))
+        return deserialize_session(raw) if raw else None
+
+    def save(self, sender, session):
+        self._redis.set(self._key(sender), serialize_session(session), ex=self._ttl)
+
+    def update(self, sender, mutate):
+        """
+        Read-modify-write the latest session with WATCH/MULTI, so another worker's save in between
+        isn't overwritten. Retries when the key changes under us; None if there is no session.
+        """
+        key = self._key(sender)
+        with self._redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    if not raw:
+                        return None
+                    session = deserialize_session(raw)
+                    mutate(session)
+                    pipe.multi()
+                    pipe.set(key, serialize_session(session), ex=self._ttl)
+                    pipe.execute()
+                    return session
+                except self._watch_error:
+                    continue
+
+    def claim(self, name, ttl):
+        """
+        Claim the job run `name` for this worker. Every worker runs the same scheduler jobs;
+        the first SET NX wins and the others skip the run. The claim expires after ttl seconds.
+        """
+        return bool(self._redis.set(f"{JOB_LOCK_PREFIX}{name}", 1, nx=True, ex=ttl))
+
+
+def create_session_store():
+    """Use Redis when REDIS_URL is set, otherwise keep sessions in memory."""
+    if REDIS_URL:
+        log.info("✅ Using Redis session store")
+        return RedisSessionStore(REDIS_URL)
+    return InMemorySessionStore()